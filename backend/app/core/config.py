@@ -2,7 +2,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-from typing import List
+import json
+from typing import Dict, List
+
+def _json_object_env(name: str) -> Dict[str, object]:
+    raw = os.getenv(name, "") or "{}"
+    try:
+        value = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"{name} is not valid JSON ({e.msg} at char {e.pos}): {raw!r}") from None
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be a JSON object, got {type(value).__name__}: {raw!r}")
+    return value
 
 class Settings:
     PORT: int = int(os.getenv("PORT", "8080"))
@@ -11,17 +22,108 @@ class Settings:
     # Firebase
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID", "")
     FIREBASE_CREDENTIALS_FILE: str = os.getenv("FIREBASE_CREDENTIALS_FILE", "serviceAccount.json")
+    # Write history items in the background instead of inside the turn's batch commit
+    FIRESTORE_HISTORY_ASYNC: bool = os.getenv("FIRESTORE_HISTORY_ASYNC", "false").lower() in ("1", "true", "yes")
+    # Maintain per-mode + daily aggregate docs (stats/{uid}) in the turn's batch commit
+    STATS_ENABLED: bool = os.getenv("STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Verified ID-token cache (entries also expire at the token's own `exp`)
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_TOKEN_CACHE_TTL_S: float = float(os.getenv("AUTH_TOKEN_CACHE_TTL_S", "300"))
+    AUTH_CERTS_REFRESH_S: float = float(os.getenv("AUTH_CERTS_REFRESH_S", "3600"))  # 0 = no prefetch
 
     # Providers (you’re using OpenRouter/Claude for all)
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
     OPENROUTER_SITE_URL: str = os.getenv("OPENROUTER_SITE_URL", "")
     OPENROUTER_APP_NAME: str = os.getenv("OPENROUTER_APP_NAME", "AI Bias Trainer")
+    OPENROUTER_BASE_URL: str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    OPENROUTER_TIMEOUT_S: float = float(os.getenv("OPENROUTER_TIMEOUT_S", "60"))
+    OPENROUTER_MAX_CONNECTIONS: int = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "200"))
+    OPENROUTER_MAX_KEEPALIVE: int = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "50"))
+
+    # Model routing per mode: JSON {mode: model | [primary, fallback, ...]}; "default" covers unlisted modes
+    LLM_MODEL_ROUTES: Dict[str, object] = _json_object_env("LLM_MODEL_ROUTES")
+    LLM_DEFAULT_MODEL: str = os.getenv("LLM_DEFAULT_MODEL", "anthropic/claude-3.5-sonnet")
+    # Resilience: total deadline per call (all retries), per-attempt timeout, jittered retries on 429/5xx
+    LLM_DEADLINE_S: float = float(os.getenv("LLM_DEADLINE_S", "25"))
+    LLM_ATTEMPT_TIMEOUT_S: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_S", "12"))
+    LLM_MAX_ATTEMPTS: int = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    LLM_RETRY_BASE_S: float = float(os.getenv("LLM_RETRY_BASE_S", "0.25"))
+    LLM_RETRY_MAX_S: float = float(os.getenv("LLM_RETRY_MAX_S", "4"))
+    # Circuit breaker per model: open after N consecutive failures, probe again after the cooldown
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_COOLDOWN_S: float = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+    # Hedging: send a second identical request once the first is slower than this latency percentile
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
 
     # -------- ABSOLUTE scoring only (hard enforced) --------
     BIAS_MODEL_NAME: str = os.getenv("BIAS_MODEL_NAME", "unitary/toxic-bert")
     BIAS_ABSOLUTE_THRESHOLD: float = float(os.getenv("BIAS_ABSOLUTE_THRESHOLD", "15.0"))  # 0–100
     BIAS_PASS_MODE: str = "absolute"  # locked
 
+    # Inference backend: "pytorch" | "quantized" (int8 dynamic) | "onnx" (needs optimum[onnxruntime])
+    BIAS_BACKEND: str = os.getenv("BIAS_BACKEND", "pytorch")
+    BIAS_ONNX_PATH: str = os.getenv("BIAS_ONNX_PATH", "")  # pre-exported ONNX dir; empty = export on load
+    BIAS_EAGER_WARMUP: bool = os.getenv("BIAS_EAGER_WARMUP", "true").lower() in ("1", "true", "yes")
+    # Warm up in a background thread instead of before the app reports ready (serverless cold starts)
+    BIAS_WARMUP_BACKGROUND: bool = os.getenv("BIAS_WARMUP_BACKGROUND", "false").lower() in ("1", "true", "yes")
+
+    # Shared out-of-process inference server (empty = load the model in every worker)
+    BIAS_SERVER_ADDRESS: str = os.getenv("BIAS_SERVER_ADDRESS", "")  # /path/to.sock or loopback host:port
+    BIAS_SERVER_AUTHKEY: str = os.getenv("BIAS_SERVER_AUTHKEY", "")  # required, shared secret; no default
+    BIAS_SERVER_TIMEOUT_S: float = float(os.getenv("BIAS_SERVER_TIMEOUT_S", "30"))
+    BIAS_SERVER_WAIT_S: float = float(os.getenv("BIAS_SERVER_WAIT_S", "120"))  # startup wait for the server
+
+    # Classifier inputs are truncated to this many tokens (toxic-bert's hard limit is 512)
+    BIAS_MAX_TOKENS: int = int(os.getenv("BIAS_MAX_TOKENS", "256"))
+
+    # Micro-batching of classifier calls across concurrent requests
+    BIAS_MICROBATCH: bool = os.getenv("BIAS_MICROBATCH", "true").lower() in ("1", "true", "yes")
+    BIAS_BATCH_MAX_SIZE: int = int(os.getenv("BIAS_BATCH_MAX_SIZE", "16"))
+    BIAS_BATCH_MAX_WAIT_MS: float = float(os.getenv("BIAS_BATCH_MAX_WAIT_MS", "5"))
+
+    # Score cache: in-memory LRU entries (0 = off) + optional SQLite file that survives restarts
+    BIAS_CACHE_SIZE: int = int(os.getenv("BIAS_CACHE_SIZE", "4096"))
+    BIAS_CACHE_PATH: str = os.getenv("BIAS_CACHE_PATH", "")
+
+    # Coalesce identical in-flight rewrite calls (model + temperature + normalized prompt) and classifier calls
+    SINGLEFLIGHT_ENABLED: bool = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Admission control: per-uid token buckets (0/min = off) + global cap on in-flight turns with a bounded queue
+    RATE_TURN_PER_MIN: float = float(os.getenv("RATE_TURN_PER_MIN", "20"))
+    RATE_TURN_BURST: float = float(os.getenv("RATE_TURN_BURST", "5"))
+    RATE_SAMPLE_PER_MIN: float = float(os.getenv("RATE_SAMPLE_PER_MIN", "30"))
+    RATE_SAMPLE_BURST: float = float(os.getenv("RATE_SAMPLE_BURST", "10"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+    ADMISSION_QUEUE: int = int(os.getenv("ADMISSION_QUEUE", "64"))
+    ADMISSION_QUEUE_TIMEOUT_S: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "2"))
+
+    # Per-turn explanation: word-occlusion saliency for original + rewrite in one batched scoring call.
+    # Each uncached turn scores up to 2 x EXPLAIN_MAX_SPANS extra texts on the batcher's background lane;
+    # bench/turn_bench.py with EXPLAIN_CACHE_SIZE=0 measured +7/+13/+44 ms p50 per turn at concurrency
+    # 1/8/32, against ~800 ms of LLM time. Turn off on slow CPUs with a large model.
+    EXPLAIN_ENABLED: bool = os.getenv("EXPLAIN_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXPLAIN_MAX_SPANS: int = int(os.getenv("EXPLAIN_MAX_SPANS", "32"))  # longer texts occlude groups of words
+    EXPLAIN_CACHE_SIZE: int = int(os.getenv("EXPLAIN_CACHE_SIZE", "2048"))
+
+    # Materialized leaderboard: top-N users kept in memory, reconciled with Firestore at most this often
+    LEADERBOARD_TTL_S: float = float(os.getenv("LEADERBOARD_TTL_S", "60"))
+    LEADERBOARD_SIZE: int = int(os.getenv("LEADERBOARD_SIZE", "200"))
+    # ...and sooner (at most this often) when a user outside the top N gains points
+    LEADERBOARD_MIN_REFRESH_S: float = float(os.getenv("LEADERBOARD_MIN_REFRESH_S", "5"))
+
+    # Pre-generated sample sentences per mode (refilled in the background)
+    SAMPLE_POOL_ENABLED: bool = os.getenv("SAMPLE_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+    SAMPLE_POOL_LOW: int = int(os.getenv("SAMPLE_POOL_LOW", "3"))
+    SAMPLE_POOL_HIGH: int = int(os.getenv("SAMPLE_POOL_HIGH", "10"))
+    SAMPLE_POOL_CONCURRENCY: int = int(os.getenv("SAMPLE_POOL_CONCURRENCY", "2"))
+
+    # Instrumentation: Prometheus /metrics; OTel spans need opentelemetry-api + an SDK configured by the deployment
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    OTEL_ENABLED: bool = os.getenv("OTEL_ENABLED", "false").lower() in ("1", "true", "yes")
+
     # CORS
     CORS_ALLOW_ORIGINS: List[str] = os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
     CORS_ALLOW_ORIGINS_REGEX: List[str] = os.getenv("CORS_ALLOW_ORIGIN_REGEX", None)
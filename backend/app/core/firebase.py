@@ -1,14 +1,25 @@
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
 from app.core.config import settings
 import os
+import threading
+
+# firebase_admin / google.cloud.firestore are imported on first use: they add
+# seconds to `import app.main`, which every cold start pays before serving.
 
 _initialized = False
+_init_lock = threading.Lock()
 
 def init_firebase():
+    if _initialized:
+        return
+    with _init_lock:
+        _init_firebase()
+
+def _init_firebase():
     global _initialized
     if _initialized:
         return
+    import firebase_admin
+    from firebase_admin import credentials
     # Why: allow both file path and env JSON for CI/cloud
     if os.path.exists(settings.FIREBASE_CREDENTIALS_FILE):
         cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_FILE)
@@ -21,8 +32,10 @@ def init_firebase():
 
 def get_auth():
     init_firebase()
+    from firebase_admin import auth
     return auth
 
 def get_db():
     init_firebase()
+    from firebase_admin import firestore
     return firestore.client()
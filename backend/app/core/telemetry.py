@@ -0,0 +1,157 @@
+"""
+Hot-path instrumentation: Prometheus metrics (served at /metrics) and optional
+OpenTelemetry spans. Spans are only emitted when OTEL_ENABLED is set and the
+opentelemetry API is installed; exporters are configured by the deployment
+(e.g. `opentelemetry-instrument`), not here.
+"""
+import contextlib
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from app.core.config import settings
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "bias_trainer_stage_seconds", "Duration of a named pipeline stage", ["stage"], buckets=_LATENCY_BUCKETS,
+)
+INFERENCE_SECONDS = Histogram(
+    "bias_trainer_inference_seconds", "Classifier forward-pass duration", buckets=_LATENCY_BUCKETS,
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "bias_trainer_inference_batch_size", "Texts per classifier forward pass", buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+LLM_REQUESTS = Counter("bias_trainer_llm_requests_total", "Provider calls by outcome", ["model", "outcome"])
+LLM_TOKENS = Counter("bias_trainer_llm_tokens_total", "Provider tokens by kind", ["model", "kind"])
+FIRESTORE_OPS = Counter("bias_trainer_firestore_ops_total", "Firestore round-trips by op", ["op"])
+HTTP_SECONDS = Histogram(
+    "bias_trainer_http_request_seconds", "HTTP request duration", ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+# ---------- stats sources (cache hit rates, pool sizes, ...) ----------
+
+_stats_sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+class _StatsCollector:
+    """Exposes registered `stats()` dicts as bias_trainer_stats{source, key} gauges at scrape time."""
+    def collect(self):
+        fam = GaugeMetricFamily("bias_trainer_stats", "Component stats (caches, pools)", labels=["source", "key"])
+        for source, fn in list(_stats_sources.items()):
+            try:
+                stats = fn() or {}
+            except Exception:
+                continue
+            for key, val in stats.items():
+                if isinstance(val, (int, float)):
+                    fam.add_metric([source, key], float(val))
+        yield fam
+
+REGISTRY.register(_StatsCollector())
+
+def register_stats(source: str, fn: Callable[[], Dict[str, float]]) -> None:
+    _stats_sources[source] = fn
+
+# ---------- tracing ----------
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def _get_tracer():
+    global _tracer
+    if not settings.OTEL_ENABLED:
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    from opentelemetry import trace
+                except ImportError:
+                    _tracer = False
+                else:
+                    _tracer = trace.get_tracer("bias-trainer")
+    return _tracer or None
+
+@contextlib.contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    tracer = _get_tracer()
+    if tracer is None:
+        yield
+        return
+    with tracer.start_as_current_span(name, attributes=attrs or None):
+        yield
+
+def start_span(name: str, **attrs):
+    """
+    Span that is never made current; the caller must `.end()` it. For async
+    generators, where a current span would leak into the consumer across `yield`.
+    """
+    tracer = _get_tracer()
+    return tracer.start_span(name, attributes=attrs or None) if tracer is not None else None
+
+# ---------- helpers used on the hot path ----------
+
+@contextlib.contextmanager
+def timed(stage: str, **attrs) -> Iterator[None]:
+    """Histogram + (optional) span around a block."""
+    t0 = time.perf_counter()
+    with span(stage, **attrs):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+def observe_stages(timings_ms: Dict[str, float], prefix: str = "") -> None:
+    for name, ms in timings_ms.items():
+        STAGE_SECONDS.labels(f"{prefix}{name}").observe(ms / 1000.0)
+
+def observe_inference(batch_size: int, seconds: float) -> None:
+    INFERENCE_SECONDS.observe(seconds)
+    INFERENCE_BATCH_SIZE.observe(batch_size)
+
+def count_llm(model: str, outcome: str, usage: Optional[Dict[str, int]] = None) -> None:
+    LLM_REQUESTS.labels(model, outcome).inc()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = (usage or {}).get(kind)
+        if n:
+            LLM_TOKENS.labels(model, kind.split("_")[0]).inc(n)
+
+FIRESTORE_OP_NAMES = ("get", "set", "query", "aggregate", "commit")
+
+def firestore_op(op: str, n: int = 1) -> None:
+    """Count completed Firestore round-trips; call after the operation returns."""
+    if op not in FIRESTORE_OP_NAMES:
+        raise ValueError(f"unknown Firestore op label '{op}'")
+    FIRESTORE_OPS.labels(op).inc(n)
+
+def metrics_payload() -> Tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route request latency, labelled by route template to keep cardinality bounded."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_SECONDS.labels(scope.get("method", ""), route, str(status["code"])).observe(time.perf_counter() - t0)
@@ -0,0 +1,155 @@
+import asyncio
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from app.core.config import settings
+from app.deps.auth import get_current_user
+
+class RateStore(ABC):
+    """
+    Token-bucket storage. `take` spends `cost` tokens from bucket `key` (refilled
+    at `rate_per_s`, capped at `burst`) and returns 0.0 when admitted, else the
+    seconds until enough tokens are back. LocalRateStore keeps buckets per
+    process; a shared store (e.g. Redis) only has to implement `take`, then
+    install it with `set_rate_store`.
+    """
+    @abstractmethod
+    def take(self, key: str, rate_per_s: float, burst: float, cost: float = 1.0) -> float: ...
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+class LocalRateStore(RateStore):
+    """In-process buckets, LRU-bounded so idle users do not accumulate forever."""
+    def __init__(self, max_keys: int = 100_000):
+        self._max = max(1, int(max_keys))
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def take(self, key: str, rate_per_s: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate_per_s)
+            if tokens >= cost:
+                wait = 0.0
+                tokens -= cost
+                self.admitted += 1
+            else:
+                wait = (cost - tokens) / rate_per_s if rate_per_s > 0 else math.inf
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"admitted": self.admitted, "rejected": self.rejected, "keys": len(self._buckets)}
+
+class ConcurrencyGate:
+    """
+    Global cap on in-flight expensive requests with a bounded wait queue.
+    Beyond `limit` running, up to `queue` callers wait at most `queue_timeout_s`
+    for a slot; anyone past that is rejected immediately with 429.
+    Strictly FIFO: a freed slot is handed to the oldest waiter, and new
+    arrivals queue behind waiters even if a slot is momentarily free.
+    """
+    def __init__(self, limit: int = 32, queue: int = 64, queue_timeout_s: float = 2.0):
+        self._limit = max(1, int(limit))
+        self._queue = max(0, int(queue))
+        self._timeout = float(queue_timeout_s)
+        self._free = self._limit
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            self.active += 1
+            return
+        if len(self._waiters) >= self._queue:
+            self._reject("Server busy, please retry")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self._timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self._hand_off()  # the slot reached us as we gave up: pass it on
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("Server busy, please retry")
+            raise
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+    def _reject(self, detail: str) -> None:
+        self.rejected += 1
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail,
+                            headers={"Retry-After": "1"})
+
+    def stats(self) -> Dict[str, float]:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected,
+                "limit": self._limit}
+
+_store: RateStore = LocalRateStore(settings.RATE_LIMIT_MAX_KEYS)
+turn_gate = ConcurrencyGate(settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_QUEUE,
+                            settings.ADMISSION_QUEUE_TIMEOUT_S)
+
+def set_rate_store(store: RateStore) -> None:
+    global _store
+    _store = store
+
+def get_rate_store() -> RateStore:
+    return _store
+
+def rate_limited(bucket: str, per_minute: float, burst: float) -> Callable:
+    """
+    Dependency factory: authenticates like get_current_user, then spends one
+    token from the caller's `bucket` and answers 429 + Retry-After when empty.
+    """
+    def dependency(user=Depends(get_current_user)):
+        if user is None or per_minute <= 0:  # CORS preflight / limit disabled
+            return user
+        wait = _store.take(f"{bucket}:{user['uid']}", per_minute / 60.0, burst)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, slow down",
+                headers={"Retry-After": str(max(1, math.ceil(min(wait, 3600))))},
+            )
+        return user
+    return dependency
+
+turn_user = rate_limited("turn", settings.RATE_TURN_PER_MIN, settings.RATE_TURN_BURST)
+sample_user = rate_limited("sample", settings.RATE_SAMPLE_PER_MIN, settings.RATE_SAMPLE_BURST)
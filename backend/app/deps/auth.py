@@ -1,16 +1,124 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from firebase_admin import auth as firebase_auth
+
+from app.core.config import settings
+from app.core.firebase import get_auth
+
+log = logging.getLogger(__name__)
 
 _bearer = HTTPBearer(auto_error=False)
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified ID-token claims keyed by sha256(token).
+    An entry lives until the token's `exp` or `max_ttl_s`, whichever is first,
+    so a cached token is never accepted past the point verify_id_token would reject it.
+    """
+    def __init__(self, max_entries: int = 10_000, max_ttl_s: float = 300.0):
+        self._max = max(0, int(max_entries))
+        self._max_ttl = float(max_ttl_s)
+        self._items: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        k = self.key(token)
+        now = time.time()
+        with self._lock:
+            hit = self._items.get(k)
+            if hit is not None and hit[0] > now:
+                self._items.move_to_end(k)
+                self.hits += 1
+                return hit[1]
+            if hit is not None:
+                del self._items[k]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        if self._max == 0:
+            return
+        expires = min(float(claims.get("exp", 0)), time.time() + self._max_ttl)
+        if expires <= time.time():
+            return
+        k = self.key(token)
+        with self._lock:
+            self._items[k] = (expires, claims)
+            self._items.move_to_end(k)
+            while len(self._items) > self._max:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._items),
+            }
+
+token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL_S)
+
+# ---------- Google public-key prefetch ----------
+
+_certs_thread: Optional[threading.Thread] = None
+_certs_lock = threading.Lock()
+
+def _refresh_certs() -> None:
+    # Best effort: warm the cert cache inside firebase_admin's own verifier so the
+    # fetch never lands on a request. Relies on firebase_admin internals.
+    from google.oauth2 import id_token
+    from firebase_admin import _token_gen
+    firebase_auth = get_auth()
+    verifier = firebase_auth._get_client(None)._token_verifier
+    id_token._fetch_certs(verifier.request, _token_gen.ID_TOKEN_CERT_URI)
+
+def _certs_loop(interval_s: float) -> None:
+    while True:
+        try:
+            _refresh_certs()
+        except Exception as e:
+            log.warning("Firebase public-key prefetch failed: %s", e)
+        time.sleep(interval_s)
+
+def start_cert_refresher() -> None:
+    global _certs_thread
+    if settings.AUTH_CERTS_REFRESH_S <= 0:
+        return
+    with _certs_lock:
+        if _certs_thread is None:
+            _certs_thread = threading.Thread(
+                target=_certs_loop, args=(settings.AUTH_CERTS_REFRESH_S,),
+                name="firebase-certs", daemon=True,
+            )
+            _certs_thread.start()
+
 def get_current_user(request: Request, creds: HTTPAuthorizationCredentials = Depends(_bearer)):
     # let CORS preflight pass
     if request.method == "OPTIONS":
         return None
     if not creds or not creds.credentials:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
+    claims = token_cache.get(creds.credentials)
+    if claims is not None:
+        return claims
+    firebase_auth = get_auth()  # initializes + imports firebase_admin on first use, not at app import
     try:
-        return firebase_auth.verify_id_token(creds.credentials)
+        claims = firebase_auth.verify_id_token(creds.credentials)
     except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    token_cache.put(creds.credentials, claims)
+    return claims
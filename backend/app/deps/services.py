@@ -0,0 +1,7 @@
+from fastapi import Request
+
+from app.services.firestore import FirestoreService
+
+def get_firestore(request: Request) -> FirestoreService:
+    """The app's one FirestoreService (and so one Firestore client), created in main.py's lifespan."""
+    return request.app.state.db
@@ -1,15 +1,63 @@
-from fastapi import FastAPI, Depends, HTTPException
-from app.deps.auth import get_current_user
-from app.services.bias import BiasService
+import asyncio
+import json
+import logging
+import math
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from app.core import telemetry
+from app.deps.auth import start_cert_refresher, token_cache
+from app.deps.admission import get_rate_store, sample_user, turn_gate, turn_user
+from app.deps.services import get_firestore
+from app.services.inference_server import create_bias_service
 from app.services.vendors import ChatService
+from app.services.resilience import ProviderError, ProviderUnavailable
 from app.services.firestore import FirestoreService
-from app.schemas.chat import SampleRequest, SampleResponse, TurnRequest, TurnResponse
+from app.services.sample_pool import SamplePool
+from app.services.explain import Explainer
+from app.services.pipeline import server_timing
+from app.services.turn import run_turn
+from app.services.leaderboard import get_leaderboard as get_materialized_leaderboard
+from app.schemas.chat import Explanation, SampleRequest, SampleResponse, TurnRequest, TurnResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.leaderboard import router as leaderboard_router
 from app.routes.me import router as me_router
+from app.routes.history import router as history_router
 from app.core.config import settings
 
-app = FastAPI(title="AI Bias Trainer Backend", version="1.1.0")
+log = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one FirestoreService (one Firestore client) for every route, via app.deps.services.get_firestore
+    app.state.db = FirestoreService()
+    if settings.BIAS_EAGER_WARMUP:
+        if settings.BIAS_WARMUP_BACKGROUND:
+            # Why: report ready right away (autoscaling); turns arriving early wait on the model load
+            threading.Thread(target=_warmup_in_background, name="bias-warmup", daemon=True).start()
+        else:
+            # Why: load + run the classifier before taking traffic, not on the first turn
+            await run_in_threadpool(bias_service.warmup)
+    start_cert_refresher()
+    if settings.SAMPLE_POOL_ENABLED:
+        await sample_pool.start()
+    try:
+        yield
+    finally:
+        await sample_pool.stop()
+        await chat_service.aclose()
+
+def _warmup_in_background() -> None:
+    try:
+        bias_service.warmup()
+    except Exception:
+        log.exception("background classifier warmup failed")
+
+app = FastAPI(title="AI Bias Trainer Backend", version="1.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,28 +68,153 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type", "Accept"],
     expose_headers=["*"],
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(telemetry.MetricsMiddleware)
 
-bias_service = BiasService()
+bias_service = create_bias_service()
 chat_service = ChatService() 
-db = FirestoreService()
+explainer = Explainer(bias_service, settings.EXPLAIN_MAX_SPANS, settings.EXPLAIN_CACHE_SIZE) if settings.EXPLAIN_ENABLED else None
+sample_pool = SamplePool(
+    chat_service,
+    scorer=bias_service,
+    low=settings.SAMPLE_POOL_LOW,
+    high=settings.SAMPLE_POOL_HIGH,
+    concurrency=settings.SAMPLE_POOL_CONCURRENCY,
+)
+
+telemetry.register_stats("bias_score_cache", bias_service.cache_stats)
+telemetry.register_stats("bias_singleflight", bias_service.flight_stats)
+telemetry.register_stats("llm_singleflight", chat_service.flight_stats)
+telemetry.register_stats("llm_provider", chat_service.provider_stats)
+telemetry.register_stats("auth_token_cache", token_cache.stats)
+telemetry.register_stats("sample_pool", sample_pool.stats)
+telemetry.register_stats("leaderboard", get_materialized_leaderboard().stats)
+telemetry.register_stats("rate_limit", get_rate_store().stats)
+telemetry.register_stats("turn_gate", turn_gate.stats)
+if explainer is not None:
+    telemetry.register_stats("explain_cache", explainer.stats)
+
+@app.exception_handler(ProviderUnavailable)
+async def provider_unavailable(request: Request, exc: ProviderUnavailable):
+    # Why: shed load while the provider is down instead of surfacing a 500
+    headers = {"Retry-After": str(max(1, math.ceil(exc.retry_after)))} if exc.retry_after else None
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+    body, content_type = telemetry.metrics_payload()
+    return Response(content=body, media_type=content_type)
 
 @app.post("/api/sampleSentence", response_model=SampleResponse)
-def sample_sentence(req: SampleRequest, user=Depends(get_current_user)):
-    sentence = chat_service.generate_sample(req.mode)
+async def sample_sentence(req: SampleRequest, user=Depends(sample_user)):
+    sentence = await sample_pool.get(req.mode)
     return SampleResponse(sentence=sentence)
 
 @app.post("/api/turn", response_model=TurnResponse)
-def turn(req: TurnRequest, user=Depends(get_current_user)):
-    rewrite = chat_service.generate_constrained(req.mode, req.original, req.instruction, req.messages)
-    result = db.handle_submission(
-        uid=user["uid"],
-        display_name=user.get("name"),
-        photo_url=user.get("picture"),
-        mode=req.mode,
-        original=req.original,
-        rewrite=rewrite,
-        scorer=bias_service,
+async def turn(req: TurnRequest, response: Response, user=Depends(turn_user),
+               db: FirestoreService = Depends(get_firestore)):
+    await turn_gate.acquire()
+    try:
+        outcome = await run_turn(
+            chat_service,
+            bias_service,
+            db,
+            uid=user["uid"],
+            display_name=user.get("name"),
+            photo_url=user.get("picture"),
+            mode=req.mode,
+            original=req.original,
+            instruction=req.instruction,
+            messages=req.messages,
+            explainer=explainer,
+        )
+    finally:
+        turn_gate.release()
+    response.headers["Server-Timing"] = server_timing(outcome.timings)
+    return _turn_response(outcome.rewrite, outcome.result, outcome.explanation)
+
+@app.post("/api/turn/stream")
+async def turn_stream(req: TurnRequest, user=Depends(turn_user),
+                      db: FirestoreService = Depends(get_firestore)):
+    """
+    Server-sent events:
+      event: token           data: {"text": "..."}        (rewrite deltas, as they arrive)
+      event: original_score  data: {"original_score": ..}
+      event: result          data: TurnResponse
+      event: error           data: {"detail": "..."}
+    """
+    # take the slot before streaming starts, so an overloaded server can still answer 429
+    await turn_gate.acquire()
+    released = False
+
+    def release_slot():
+        # runs from the generator's finally and as a background task; whichever comes first wins
+        nonlocal released
+        if not released:
+            released = True
+            turn_gate.release()
+
+    async def events():
+        # original's score does not depend on the rewrite; it also warms the score cache
+        original_task = asyncio.create_task(asyncio.to_thread(bias_service.score_many, [req.original]))
+        try:
+            yield ": ok\n\n"  # flush headers right away
+            parts = []
+            async for delta in chat_service.stream_constrained(req.mode, req.original, req.instruction, req.messages):
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+            rewrite = "".join(parts).strip()
+            original_p = (await original_task)[0]
+            yield _sse("original_score", {"original_score": round(original_p * 100.0, 2)})
+            result = await run_in_threadpool(
+                db.handle_submission,
+                uid=user["uid"],
+                display_name=user.get("name"),
+                photo_url=user.get("picture"),
+                mode=req.mode,
+                original=req.original,
+                rewrite=rewrite,
+                scorer=bias_service,
+            )
+            explanation = await _explain(req.mode, req.original, rewrite, result)
+            yield _sse("result", _turn_response(rewrite, result, explanation).model_dump())
+        except Exception as e:
+            log.exception("turn stream failed")
+            # provider/HTTP errors are meant for the client; anything else stays in the server log
+            if isinstance(e, HTTPException):
+                detail = e.detail
+            elif isinstance(e, ProviderError):
+                detail = str(e)
+            else:
+                detail = "Internal Server Error"
+            yield _sse("error", {"detail": detail})
+        finally:
+            original_task.cancel()
+            release_slot()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot),
     )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _explain(mode: str, original: str, rewrite: str, result) -> Optional[Explanation]:
+    if explainer is None:
+        return None
+    try:
+        return await asyncio.to_thread(explainer.explain_turn, mode, original, rewrite,
+                                       result.points_awarded > 0, result.threshold)
+    except Exception:
+        log.exception("turn explanation failed")
+        return None
+
+def _turn_response(rewrite: str, result, explanation: Optional[Explanation] = None) -> TurnResponse:
     passed = result.points_awarded > 0  # single source of truth
     return TurnResponse(
         reply=rewrite,
@@ -52,7 +225,9 @@ def turn(req: TurnRequest, user=Depends(get_current_user)):
         passed=passed,
         points_awarded=result.points_awarded,
         history_item=result.history_item.model_dump(),
+        explanation=explanation,
     )
 
 app.include_router(leaderboard_router)
-app.include_router(me_router)
\ No newline at end of file
+app.include_router(me_router)
+app.include_router(history_router)
\ No newline at end of file
@@ -0,0 +1,47 @@
+import json
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.deps.auth import get_current_user
+from app.deps.services import get_firestore
+from app.schemas.history import HistoryPage
+from app.services.firestore import FirestoreService
+
+router = APIRouter(prefix="/api", tags=["history"])
+
+@router.get("/history", response_model=HistoryPage)
+def get_history(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    user = Depends(get_current_user),
+    db: FirestoreService = Depends(get_firestore),
+):
+    # fields=summary skips original/rewrite bodies for list views
+    try:
+        items, next_cursor = db.get_user_history_page(
+            user["uid"], limit=limit, cursor=cursor, summary=(fields == "summary"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return HistoryPage(items=items, next_cursor=next_cursor)
+
+@router.get("/history/export")
+def export_history(
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    user = Depends(get_current_user),
+    db: FirestoreService = Depends(get_firestore),
+):
+    """Entire history as one JSON array, streamed page by page (constant memory)."""
+    def body() -> Iterator[str]:
+        yield "["
+        for i, item in enumerate(db.iter_user_history(user["uid"], summary=(fields == "summary"))):
+            yield ("," if i else "") + json.dumps(item)
+        yield "]"
+
+    return StreamingResponse(
+        body(),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="history.json"'},
+    )
@@ -1,27 +1,39 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from app.core import telemetry
 from app.deps.auth import get_current_user
+from app.deps.services import get_firestore
+from app.schemas.stats import UserStats
 from app.services.firestore import FirestoreService
+from app.services.leaderboard import get_leaderboard as get_materialized_leaderboard
 
 router = APIRouter(prefix="/api", tags=["me"])
-db = FirestoreService()
 
 @router.get("/me/summary")
-def me_summary(user = Depends(get_current_user)):
+def me_summary(user = Depends(get_current_user), db: FirestoreService = Depends(get_firestore)):
     # shape matches frontend MeSummary
     uref = db.db.collection("users").document(user["uid"]).get()
+    telemetry.firestore_op("get")
     data = uref.to_dict() or {}
     return {
         "uid": user["uid"],
         "username": data.get("name") or user.get("name"),
         "points": data.get("points", 0),
         "photoURL": data.get("photo_url") or user.get("picture"),
-        # rank can be computed client-side from /api/leaderboard
+        "rank": get_materialized_leaderboard().rank(user["uid"], points=data.get("points", 0)),
     }
 
 @router.post("/me/update")
-def me_update(payload: dict, user = Depends(get_current_user)):
+def me_update(payload: dict, user = Depends(get_current_user), db: FirestoreService = Depends(get_firestore)):
     # update display name only for now
     name = (payload.get("username") or "").strip()
     ref = db.db.collection("users").document(user["uid"])
     ref.set({"name": name}, merge=True)
+    telemetry.firestore_op("set")
+    get_materialized_leaderboard().set_profile(user["uid"], name=name)
     return {"ok": True}
+
+@router.get("/me/stats", response_model=UserStats)
+def me_stats(days: int = Query(7, ge=0, le=90), user = Depends(get_current_user),
+             db: FirestoreService = Depends(get_firestore)):
+    # precomputed per-mode aggregates + daily rollups (maintained in handle_submission)
+    return db.get_user_stats(user["uid"], days=days)
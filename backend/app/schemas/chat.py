@@ -1,11 +1,14 @@
-from pydantic import BaseModel
-from typing import List, Literal
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+# Why: bound per-request model and prompt cost; sample sentences are 1–2 lines
+MAX_TEXT_CHARS = 2000
 
 Mode = Literal["gpt4-gender", "llama3-sexual", "gemini-age"]
 
 class ChatMessage(BaseModel):
     role: Literal["system", "user", "assistant"]
-    content: str
+    content: str = Field(max_length=MAX_TEXT_CHARS)
 
 class SampleRequest(BaseModel):
     mode: Mode
@@ -16,9 +19,26 @@ class SampleResponse(BaseModel):
 # NEW: one-turn API
 class TurnRequest(BaseModel):
     mode: Mode
-    original: str
-    instruction: str
-    messages: List[ChatMessage] = []
+    original: str = Field(max_length=MAX_TEXT_CHARS)
+    instruction: str = Field(max_length=MAX_TEXT_CHARS)
+    messages: List[ChatMessage] = Field(default=[], max_length=20)
+
+class TokenAttribution(BaseModel):
+    token: str
+    weight: float  # bias score points (0..100) lost when this word is removed; > 0 = word adds bias
+
+class TextExplanation(BaseModel):
+    score: float  # 0..100
+    severity: Literal["low", "medium", "high"]
+    note: str
+    tokens: List[TokenAttribution]
+    top: List[str]  # words contributing most to the score, strongest first
+
+class Explanation(BaseModel):
+    bias_type: str
+    summary: str  # "Why it worked/didn't"
+    original: TextExplanation
+    rewrite: TextExplanation
 
 class TurnResponse(BaseModel):
     reply: str
@@ -29,3 +49,4 @@ class TurnResponse(BaseModel):
     passed: bool
     points_awarded: int
     history_item: dict
+    explanation: Optional[Explanation] = None
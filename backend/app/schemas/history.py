@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Literal, Optional, List
+from typing import Literal, Optional, List, Union
 from .chat import Mode
 
 class AnalyzeRequest(BaseModel):
@@ -16,18 +16,25 @@ class RewriteRequest(BaseModel):
     original: str
     rewrite: str
 
-class HistoryItem(BaseModel):
+class HistorySummary(BaseModel):
+    """History item without the sentence bodies (list views)."""
     id: str
     mode: Mode
     bias_type: str
-    original: str
-    rewrite: str
     original_score: float
     rewrite_score: float
     delta: float
     points_awarded: int
     created_at: str
 
+class HistoryItem(HistorySummary):
+    original: str
+    rewrite: str
+
+class HistoryPage(BaseModel):
+    items: List[Union[HistoryItem, HistorySummary]]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page; None on the last page
+
 class RewriteResponse(BaseModel):
     success: bool
     bias_type: str
@@ -6,3 +6,4 @@ class LeaderboardEntry(BaseModel):
     name: Optional[str] = None
     photo_url: Optional[str] = None
     points: int
+    rank: Optional[int] = None
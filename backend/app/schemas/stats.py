@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class ModeStats(BaseModel):
+    bias_type: Optional[str] = None
+    count: int = 0
+    passes: int = 0
+    points: int = 0
+    pass_rate: float = 0.0          # passes / count
+    mean_delta: float = 0.0         # mean (original_score - rewrite_score), 0..100 scale
+    mean_original_score: float = 0.0
+    mean_rewrite_score: float = 0.0
+
+class DailyStats(BaseModel):
+    date: str  # YYYY-MM-DD (UTC)
+    total: ModeStats
+    modes: Dict[str, ModeStats] = {}
+
+class UserStats(BaseModel):
+    uid: str
+    total: ModeStats
+    modes: Dict[str, ModeStats] = {}
+    daily: List[DailyStats] = []
@@ -0,0 +1,89 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Sequence, Tuple
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from concurrent callers into one call of `fn`.
+    A batch is flushed when it reaches `max_batch_size` or when the first
+    queued item has waited `max_wait_ms`, whichever comes first.
+    `fn` takes a list of items and must return one result per item, in order.
+
+    Items carry a priority (lower runs first). A batch never mixes priorities,
+    and only priority-0 batches wait out the window, so background work runs
+    on the same thread between live batches instead of queueing them behind it.
+    """
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        self._fn = fn
+        self._max_batch = max(1, int(max_batch_size))
+        self._max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._name = name
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Any, Future]]" = queue.PriorityQueue()
+        self._seq = itertools.count()  # FIFO within a priority; also keeps Futures out of comparisons
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, items: Sequence[Any], priority: int = 0) -> List[Future]:
+        self._start()
+        futures = []
+        for item in items:
+            fut: Future = Future()
+            self._queue.put((priority, next(self._seq), item, fut))
+            futures.append(fut)
+        return futures
+
+    def run(self, items: Sequence[Any], priority: int = 0) -> List[Any]:
+        """Blocking helper: submit and wait for all results."""
+        return [f.result() for f in self.submit(items, priority)]
+
+    # ---------- worker ----------
+
+    def _start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[int, int, Any, Future]]:
+        batch = [self._queue.get()]
+        priority = batch[0][0]
+        # only live items are worth waiting for; background batches take what is already queued
+        deadline = time.monotonic() + (self._max_wait if priority == 0 else 0.0)
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    # window closed: still take whatever is already queued
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry[0] != priority:
+                self._queue.put(entry)  # leads the next batch
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for _, _, item, _ in batch]
+            try:
+                results = list(self._fn(items))
+                if len(results) != len(batch):
+                    # zip would drop the tail and leave those callers waiting forever
+                    raise RuntimeError(f"{self._name}: fn returned {len(results)} results for {len(batch)} items")
+            except BaseException as e:
+                for *_, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (*_, fut), res in zip(batch, results):
+                fut.set_result(res)
@@ -1,23 +1,111 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, TextClassificationPipeline
-from typing import Optional
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-class BiasService:
+from app.core import telemetry
+from app.services.batching import MicroBatcher
+from app.services.inference import build_pipeline
+from app.services.score_cache import ScoreCache, normalize_text, text_key
+from app.services.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from transformers import TextClassificationPipeline
+
+class BiasScorer(ABC):
+    """
+    What the app needs from a classifier: probabilities in [0,1] plus the
+    helpers built on them. BiasService runs the model in-process;
+    RemoteBiasService (inference_server.py) forwards to a shared server.
+    """
+    @abstractmethod
+    def score_many(self, texts: List[str]) -> List[float]:
+        """Return probabilities in [0,1], one per text, in order."""
+
+    @abstractmethod
+    def score_uncached(self, texts: List[str]) -> List[float]:
+        """
+        Like score_many, but neither reads nor fills the score cache (throwaway
+        texts); a batching scorer runs them behind live scoring.
+        """
+
+    @abstractmethod
+    def model_key(self) -> str:
+        """Identifies model, backend and truncation: everything a score depends on besides the text."""
+
+    @abstractmethod
+    def warmup(self) -> None:
+        """Block until the first score will not pay a cold start."""
+
+    @abstractmethod
+    def cache_stats(self) -> Dict[str, float]: ...
+
+    @abstractmethod
+    def flight_stats(self) -> Dict[str, float]: ...
+
+    def score01(self, text: str) -> float:
+        """Return probability in [0,1]."""
+        return self.score_many([text])[0]
+
+    def score100(self, text: str) -> float:
+        """Return absolute score in [0,100]."""
+        return round(self.score01(text) * 100.0, 2)
+
+    # keep helpers
+    def type_from_mode(self, mode: str) -> str:
+        if mode.startswith("gpt4"): return "Gender"
+        if "llama3" in mode: return "Sexual"
+        return "Age"
+
+    @staticmethod
+    def severity(score100: float) -> str:
+        return "high" if score100 >= 70 else "medium" if score100 >= 40 else "low"
+
+    def explain(self, text: str, score100: float, bias_type: str) -> str:
+        sev = self.severity(score100)
+        return f"This shows {sev} {bias_type.lower()} bias risk (score {score100}/100). Use inclusive language."
+
+class BiasService(BiasScorer):
     """Model returns probability in [0,1]. We'll scale to [0,100] in callers."""
     def __init__(self, model_name: Optional[str] = None):
         from app.core.config import settings
         self._model_name = model_name or settings.BIAS_MODEL_NAME
-        self._pipe: Optional[TextClassificationPipeline] = None
+        self._backend = settings.BIAS_BACKEND
+        self._pipe: Optional["TextClassificationPipeline"] = None
+        self._load_lock = threading.Lock()
+        self._max_batch = settings.BIAS_BATCH_MAX_SIZE
+        self._max_tokens = settings.BIAS_MAX_TOKENS
+        # Why: concurrent /api/turn calls share one padded forward pass
+        self._batcher: Optional[MicroBatcher] = None
+        if settings.BIAS_MICROBATCH:
+            self._batcher = MicroBatcher(
+                self._score_batch,
+                max_batch_size=settings.BIAS_BATCH_MAX_SIZE,
+                max_wait_ms=settings.BIAS_BATCH_MAX_WAIT_MS,
+                name="bias-batcher",
+            )
+        # Why: samples repeat across players; score each text once per model
+        self._cache: Optional[ScoreCache] = None
+        if settings.BIAS_CACHE_SIZE > 0 or settings.BIAS_CACHE_PATH:
+            self._cache = ScoreCache(settings.BIAS_CACHE_SIZE, settings.BIAS_CACHE_PATH or None)
+        # Why: two players submitting the same text at once should cost one forward pass
+        self._flight: Optional[SingleFlight] = SingleFlight() if settings.SINGLEFLIGHT_ENABLED else None
 
     def _ensure(self) -> None:
         if self._pipe is None:
-            model = AutoModelForSequenceClassification.from_pretrained(self._model_name)
-            tok = AutoTokenizer.from_pretrained(self._model_name)
-            self._pipe = TextClassificationPipeline(model=model, tokenizer=tok, return_all_scores=True)
+            with self._load_lock:
+                if self._pipe is None:
+                    with telemetry.timed("model_load", backend=self._backend):
+                        self._pipe = build_pipeline(self._model_name, self._backend)
 
-    def score01(self, text: str) -> float:
-        """Return probability in [0,1]."""
+    def warmup(self) -> None:
+        """Load the model and run one forward pass so the first /api/turn is not a cold start."""
         self._ensure()
-        out = self._pipe(text)[0]  # list of {label, score}
+        self._score_batch(["warmup"])
+
+    @staticmethod
+    def _pick(out: List[dict]) -> float:
+        """Reduce one list of {label, score} to the toxic probability in [0,1]."""
         val = None
         for o in out:
             if "toxic" in o["label"].lower():
@@ -29,16 +117,120 @@ class BiasService:
         if val > 1: val = 1.0
         return round(val, 4)
 
-    def score100(self, text: str) -> float:
-        """Return absolute score in [0,100]."""
-        return round(self.score01(text) * 100.0, 2)
+    def _score_batch(self, texts: List[str]) -> List[float]:
+        """Score `texts`, truncated to BIAS_MAX_TOKENS and padded per length bucket."""
+        self._ensure()
+        t0 = time.perf_counter()
+        with telemetry.span("inference", batch_size=len(texts)):
+            if hasattr(self._pipe, "tokenizer") and hasattr(self._pipe, "model"):
+                probs = self._score_tokenized(list(texts))
+            else:
+                outs = self._pipe(list(texts), batch_size=max(1, min(len(texts), self._max_batch)),
+                                  truncation=True, max_length=self._max_tokens)
+                probs = [self._pick(out) for out in outs]
+        telemetry.observe_inference(len(texts), time.perf_counter() - t0)
+        return probs
 
-    # keep helpers
-    def type_from_mode(self, mode: str) -> str:
-        if mode.startswith("gpt4"): return "Gender"
-        if "llama3" in mode: return "Sexual"
-        return "Age"
+    def _score_tokenized(self, texts: List[str]) -> List[float]:
+        """
+        Tokenize the whole batch once, sort by token length and run one forward
+        pass per length bucket, so short texts never pad up to a long outlier.
+        """
+        import torch
+        tok, model = self._pipe.tokenizer, self._pipe.model
+        enc = tok(texts, truncation=True, max_length=self._max_tokens)
+        lengths = [len(ids) for ids in enc["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        labels = model.config.id2label
+        results = [0.0] * len(texts)
+        for group in self._buckets(order, lengths):
+            feats = [{k: enc[k][i] for k in enc.keys()} for i in group]
+            batch = tok.pad(feats, return_tensors="pt")
+            with torch.inference_mode():
+                logits = model(**batch).logits
+            for i, row in zip(group, self._activate(logits, model.config).tolist()):
+                results[i] = self._pick([{"label": labels[j], "score": p} for j, p in enumerate(row)])
+        return results
 
-    def explain(self, text: str, score100: float, bias_type: str) -> str:
-        sev = "high" if score100 >= 70 else "medium" if score100 >= 40 else "low"
-        return f"This shows {sev} {bias_type.lower()} bias risk (score {score100}/100). Use inclusive language."
+    def _buckets(self, order: List[int], lengths: List[int]) -> List[List[int]]:
+        """Split length-sorted indices at power-of-two token lengths and at the max batch size."""
+        groups: List[List[int]] = []
+        cur: List[int] = []
+        cur_cap = 0
+        for i in order:
+            cap = max(8, 1 << (max(1, lengths[i]) - 1).bit_length())
+            if cur and (cap != cur_cap or len(cur) >= self._max_batch):
+                groups.append(cur)
+                cur = []
+            cur.append(i)
+            cur_cap = cap
+        if cur:
+            groups.append(cur)
+        return groups
+
+    @staticmethod
+    def _activate(logits, config):
+        # same choice TextClassificationPipeline makes for its default function_to_apply
+        import torch
+        if getattr(config, "problem_type", None) == "multi_label_classification" or config.num_labels == 1:
+            return torch.sigmoid(logits)
+        return torch.softmax(logits, dim=-1)
+
+    def _run(self, texts: List[str]) -> List[float]:
+        if self._batcher is not None:
+            return self._batcher.run(texts)
+        return self._score_batch(texts)
+
+    def score_many(self, texts: List[str]) -> List[float]:
+        """Return probabilities in [0,1], one per text, in order."""
+        if not texts:
+            return []
+        keys = [text_key(self.model_key(), t) for t in texts]
+        known: Dict[str, float] = self._cache.get_many(keys) if self._cache is not None else {}
+        todo: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in known:
+                # score exactly what the key hashes, so texts sharing a key share a score
+                todo.setdefault(k, normalize_text(t))
+        if todo:
+            if self._flight is None:
+                known.update(self._score_missing(todo))
+            else:
+                # score only the keys nobody else is already scoring; wait for the rest
+                owned, waiting = self._flight.claim(todo.keys())
+                if owned:
+                    try:
+                        fresh = self._score_missing({k: todo[k] for k in owned})
+                    except BaseException as e:
+                        self._flight.fail(owned, e)
+                        raise
+                    self._flight.resolve(fresh)
+                    known.update(fresh)
+                for k, fut in waiting.items():
+                    known[k] = fut.result()
+        return [known[k] for k in keys]
+
+    def score_uncached(self, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        texts = [normalize_text(t) for t in texts]
+        if self._batcher is not None:
+            # Why: background lane of the same model thread; live turns are batched ahead of these
+            return self._batcher.run(texts, priority=1)
+        return self._score_batch(texts)
+
+    def model_key(self) -> str:
+        # backend + truncation are part of the key: both can change the score
+        return f"{self._model_name}@{self._backend}:{self._max_tokens}"
+
+    def _score_missing(self, todo: Dict[str, str]) -> Dict[str, float]:
+        fresh = dict(zip(todo.keys(), self._run(list(todo.values()))))
+        if self._cache is not None:
+            self._cache.put_many(fresh.items())
+        return fresh
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self._cache.stats() if self._cache is not None else {}
+
+    def flight_stats(self) -> Dict[str, float]:
+        return self._flight.stats() if self._flight is not None else {}
@@ -0,0 +1,127 @@
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from app.core import telemetry
+from app.schemas.chat import Explanation, TextExplanation, TokenAttribution
+from app.services.bias import BiasScorer
+from app.services.score_cache import text_key
+
+_WORD = re.compile(r"[\w'’-]+")
+
+WHY_WORKED = "Why it worked: the {bias} bias score dropped from {original} to {rewrite}, within the {threshold} limit."
+WHY_NOT = "Why it didn't: the rewrite still scores {rewrite}, above the {threshold} limit."
+CHANGED = " Changing {words} made the biggest difference."
+STILL = " Words like {words} still carry most of the bias."
+
+Attribution = Tuple[float, List[Tuple[str, float]]]  # (p of the full text, [(word, weight in points)])
+
+class Explainer:
+    """
+    Gradient-free word saliency by occlusion: each word (or group of words for
+    long texts, at most `max_spans` per text) is cut out and the text re-scored;
+    its weight is how many bias points the score loses without it, split evenly
+    across the words of a group. The full texts come from `score_many` (usually
+    cache hits after the turn's own scoring); all occluded variants of both
+    texts go through one `score_uncached` call, so they never evict real
+    entries from the score cache and are scored behind live turns.
+    Attributions are cached per normalized text hash.
+    """
+    def __init__(self, scorer: BiasScorer, max_spans: int = 32, cache_size: int = 2048):
+        self._scorer = scorer
+        self._max_spans = max(1, int(max_spans))
+        self._max = max(0, int(cache_size))
+        self._cache: "OrderedDict[str, Attribution]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _spans(self, text: str) -> List[Tuple[int, int]]:
+        words = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+        size = max(1, math.ceil(len(words) / self._max_spans))
+        return [(words[i][0], words[min(i + size, len(words)) - 1][1]) for i in range(0, len(words), size)]
+
+    @staticmethod
+    def _occlude(text: str, span: Tuple[int, int]) -> str:
+        return " ".join((text[:span[0]] + " " + text[span[1]:]).split())
+
+    def attribute_many(self, texts: List[str]) -> List[Attribution]:
+        # scores depend on the scorer's model, so attributions do too
+        ns = f"explain:{self._scorer.model_key()}"
+        keys = [text_key(ns, t) for t in texts]
+        found: Dict[str, Attribution] = {}
+        with self._lock:
+            for k in keys:
+                hit = self._cache.get(k)
+                if hit is not None:
+                    self._cache.move_to_end(k)
+                    found[k] = hit
+            todo = {k: t for k, t in zip(keys, texts) if k not in found}
+            self.hits += len(keys) - len(todo)
+            self.misses += len(todo)
+        if todo:
+            # one uncached batch with the occluded variants of every text
+            plan = []
+            variants: List[str] = []
+            for k, t in todo.items():
+                spans = self._spans(t)
+                plan.append((k, t, spans, len(variants)))
+                variants.extend(self._occlude(t, s) for s in spans)
+            with telemetry.timed("explain", texts=len(todo)):
+                fulls = self._scorer.score_many([t for _, t, _, _ in plan])
+                probs = self._scorer.score_uncached(variants)
+            for (k, t, spans, i), full in zip(plan, fulls):
+                tokens: List[Tuple[str, float]] = []
+                for j, (s, e) in enumerate(spans):
+                    words = [m.group(0) for m in _WORD.finditer(t, s, e)]
+                    weight = round((full - probs[i + j]) * 100.0 / len(words), 2)
+                    tokens.extend((w, weight) for w in words)
+                found[k] = (full, tokens)
+            with self._lock:
+                for k, *_ in plan:
+                    self._cache[k] = found[k]
+                    self._cache.move_to_end(k)
+                while len(self._cache) > self._max:
+                    self._cache.popitem(last=False)
+        return [found[k] for k in keys]
+
+    def _text(self, text: str, attribution: Attribution, bias_type: str) -> TextExplanation:
+        full, tokens = attribution
+        score = round(full * 100.0, 2)
+        ranked = sorted((w for w in tokens if w[1] >= 1.0), key=lambda w: -w[1])
+        top = list(dict.fromkeys(tok for tok, _ in ranked))[:3]
+        return TextExplanation(
+            score=score,
+            severity=BiasScorer.severity(score),
+            note=self._scorer.explain(text, score, bias_type),
+            tokens=[TokenAttribution(token=tok, weight=w) for tok, w in tokens],
+            top=top,
+        )
+
+    def explain_turn(self, mode: str, original: str, rewrite: str, passed: bool, threshold: float) -> Explanation:
+        bias_type = self._scorer.type_from_mode(mode)
+        orig_attr, rew_attr = self.attribute_many([original, rewrite])
+        orig = self._text(original, orig_attr, bias_type)
+        rew = self._text(rewrite, rew_attr, bias_type)
+        fmt = {"bias": bias_type.lower(), "original": orig.score, "rewrite": rew.score, "threshold": threshold}
+        if passed:
+            summary = WHY_WORKED.format(**fmt)
+            kept = {w.lower() for w in _WORD.findall(rewrite)}
+            changed = [w for w in orig.top if w.lower() not in kept]
+            if changed:
+                summary += CHANGED.format(words=_quote(changed))
+        else:
+            summary = WHY_NOT.format(**fmt)
+            if rew.top:
+                summary += STILL.format(words=_quote(rew.top))
+        return Explanation(bias_type=bias_type, summary=summary, original=orig, rewrite=rew)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+def _quote(words: List[str]) -> str:
+    quoted = [f"“{w}”" for w in words]
+    return quoted[0] if len(quoted) == 1 else ", ".join(quoted[:-1]) + " and " + quoted[-1]
@@ -1,110 +1,335 @@
-from typing import List, Dict, Any
+import base64
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from google.cloud.firestore_v1 import Increment
 
+from app.core import telemetry
 from app.core.firebase import get_db
 from app.core.config import settings
-from app.schemas.history import HistoryItem, RewriteResponse
+from app.schemas.history import HistoryItem, HistorySummary, RewriteResponse
 from app.schemas.leaderboard import LeaderboardEntry
-from app.services.bias import BiasService
+from app.schemas.stats import DailyStats, ModeStats, UserStats
+from app.services.bias import BiasScorer
+from app.services.leaderboard import get_leaderboard as get_materialized_leaderboard
+
+log = logging.getLogger(__name__)
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
+# projection for list views: everything HistorySummary needs, no sentence bodies
+HISTORY_SUMMARY_FIELDS = ["mode", "bias_type", "original_score", "rewrite_score", "delta",
+                          "points_awarded", "created_at"]
+
+def encode_cursor(created_at: str, doc_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, doc_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), str(doc_id)
+    except Exception as e:
+        raise ValueError("invalid history cursor") from e
+
+def score_verdict(original_p: float, rewrite_p: float, threshold: Optional[float] = None) -> Dict[str, Any]:
+    """Scored fields of a history item from 0..1 probabilities (absolute pass rule; shared with rescore)."""
+    original_score = round(original_p * 100.0, 2)  # 0..100
+    rewrite_score  = round(rewrite_p * 100.0, 2)   # 0..100
+    threshold = float(settings.BIAS_ABSOLUTE_THRESHOLD if threshold is None else threshold)
+    passed = rewrite_score <= threshold
+    return {
+        "original_score": original_score,
+        "rewrite_score": rewrite_score,
+        "delta": round(original_score - rewrite_score, 2),
+        "threshold": threshold,
+        "passed": passed,
+        "points_awarded": 10 if passed else 0,
+    }
+
+# background writer for fire-and-forget history writes
+_bg_writes = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fs-bg")
+
+def _log_bg_failure(fut) -> None:
+    if fut.exception() is not None:
+        log.error("background history write failed: %s", fut.exception())
+    else:
+        telemetry.firestore_op("set")
+
 @dataclass
 class FirestoreService:
+    """
+    One instance per app, created in main.py's lifespan and handed to routes
+    via app.deps.services.get_firestore. The client is opened on first use.
+    """
     def __post_init__(self):
-        self.db = get_db()
-
-    def ensure_user_document(self, user: Dict[str, Any]) -> None:
-        ref = self.db.collection("users").document(user["uid"])
-        if not ref.get().exists:
-            ref.set({
-                "uid": user["uid"],
-                "email": user.get("email"),
-                "name": user.get("name"),
-                "photo_url": user.get("picture"),
-                "points": 0,
-                "streak": 0,
-                "createdAt": now_iso(),
-                "updatedAt": now_iso(),
-            }, merge=True)
-
-    def update_points(self, uid: str, delta_points: int) -> int:
-        ref = self.db.collection("users").document(uid)
-        ref.set({"points": Increment(int(delta_points)), "updatedAt": now_iso()}, merge=True)
-        return (ref.get().to_dict() or {}).get("points", 0)
+        self._db = None
+        # uids whose user doc is known to exist; skips the create-if-missing read
+        self._known_users: "OrderedDict[str, None]" = OrderedDict()
+        self._known_lock = threading.Lock()
+        self._known_max = 100_000
+
+    @property
+    def db(self):
+        # Why: creating the client imports google.cloud.firestore; keep that off the import/startup path
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    def user_create_fields(self, uid: str, display_name: Optional[str], photo_url: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Fields to create the user doc with if it looked missing, else None.
+        Reads Firestore only the first time this process sees `uid`. The read is
+        only a hint: persist_submission creates the doc with a precondition, so
+        two concurrent first turns cannot both initialize it.
+        """
+        with self._known_lock:
+            if uid in self._known_users:
+                self._known_users.move_to_end(uid)
+                return None
+        exists = self.db.collection("users").document(uid).get().exists
+        telemetry.firestore_op("get")
+        if exists:
+            self._remember_user(uid)
+            return None
+        return {
+            "uid": uid,
+            "email": None,
+            "name": display_name,
+            "photo_url": photo_url,
+            "streak": 0,
+            "createdAt": now_iso(),
+        }
+
+    def _remember_user(self, uid: str) -> None:
+        with self._known_lock:
+            self._known_users[uid] = None
+            self._known_users.move_to_end(uid)
+            while len(self._known_users) > self._known_max:
+                self._known_users.popitem(last=False)
+
+    def persist_submission(self, uid: str, item: Dict[str, Any],
+                           create_fields: Optional[Dict[str, Any]] = None,
+                           history_async: Optional[bool] = None) -> str:
+        """
+        One WriteBatch commit: history item + user create (or points increment)
+        + per-mode aggregates in stats/{uid} and stats/{uid}/daily/{date}.
+        `create_fields` comes from user_create_fields(). With `history_async`,
+        the history write leaves the batch and runs in the background.
+        """
+        from google.api_core.exceptions import AlreadyExists
+        if history_async is None:
+            history_async = settings.FIRESTORE_HISTORY_ASYNC
+        hist_ref = self.db.collection("histories").document(uid).collection("items").document()
+        points = int(item["points_awarded"])
+
+        try:
+            committed_at = self._commit_submission(uid, item, hist_ref, create_fields, history_async)
+        except AlreadyExists:
+            if create_fields is None:
+                raise
+            # another turn created the user doc since our read; the batch was not applied
+            create_fields = None
+            committed_at = self._commit_submission(uid, item, hist_ref, None, history_async)
+        self._remember_user(uid)
+        if create_fields is not None or points:
+            get_materialized_leaderboard().apply(
+                uid, points,
+                name=(create_fields or {}).get("name"),
+                photo_url=(create_fields or {}).get("photo_url"),
+                created=create_fields is not None,
+                committed_at=committed_at,
+            )
+
+        if history_async:
+            _bg_writes.submit(hist_ref.set, item).add_done_callback(_log_bg_failure)
+        return hist_ref.id
+
+    def _commit_submission(self, uid: str, item: Dict[str, Any], hist_ref,
+                           create_fields: Optional[Dict[str, Any]], history_async: bool) -> Optional[datetime]:
+        """Commit the turn's batch; returns the commit time (every write in a batch shares it)."""
+        from google.cloud.firestore_v1 import Increment
+        user_ref = self.db.collection("users").document(uid)
+        points = int(item["points_awarded"])
+        batch = self.db.batch()
+        if not history_async:
+            batch.set(hist_ref, item)
+        if create_fields is not None:
+            # create() fails the whole commit with AlreadyExists if the doc appeared meanwhile
+            batch.create(user_ref, {**create_fields, "points": points, "updatedAt": now_iso()})
+        elif points:
+            batch.set(user_ref, {"points": Increment(points), "updatedAt": now_iso()}, merge=True)
+        if settings.STATS_ENABLED:
+            stats_ref = self.db.collection("stats").document(uid)
+            day = item["created_at"][:10]
+            batch.set(stats_ref, {"uid": uid, **self._stats_increments(item)}, merge=True)
+            batch.set(stats_ref.collection("daily").document(day),
+                      {"date": day, **self._stats_increments(item)}, merge=True)
+        with telemetry.timed("firestore.commit"):
+            results = batch.commit()
+        telemetry.firestore_op("commit")
+        return results[0].update_time if results else None
+
+    @staticmethod
+    def _stats_increments(item: Dict[str, Any]) -> Dict[str, Any]:
+        # running sums only; means/rates are derived on read
+        from google.cloud.firestore_v1 import Increment
+        return {
+            "modes": {item["mode"]: {
+                "bias_type": item["bias_type"],
+                "count": Increment(1),
+                "passes": Increment(1 if item["passed"] else 0),
+                "points": Increment(int(item["points_awarded"])),
+                "sum_delta": Increment(float(item["delta"])),
+                "sum_original_score": Increment(float(item["original_score"])),
+                "sum_rewrite_score": Increment(float(item["rewrite_score"])),
+            }},
+            "updatedAt": now_iso(),
+        }
+
+    @staticmethod
+    def _mode_stats(raw: Dict[str, Any]) -> ModeStats:
+        count = int(raw.get("count") or 0)
+        passes = int(raw.get("passes") or 0)
+
+        def mean(key: str) -> float:
+            return round(float(raw.get(key) or 0.0) / count, 2) if count else 0.0
+
+        return ModeStats(
+            bias_type=raw.get("bias_type"),
+            count=count,
+            passes=passes,
+            points=int(raw.get("points") or 0),
+            pass_rate=round(passes / count, 4) if count else 0.0,
+            mean_delta=mean("sum_delta"),
+            mean_original_score=mean("sum_original_score"),
+            mean_rewrite_score=mean("sum_rewrite_score"),
+        )
+
+    def _rollup(self, modes_raw: Dict[str, Dict[str, Any]]) -> Tuple[ModeStats, Dict[str, ModeStats]]:
+        total: Dict[str, float] = {}
+        for raw in modes_raw.values():
+            for key in ("count", "passes", "points", "sum_delta", "sum_original_score", "sum_rewrite_score"):
+                total[key] = total.get(key, 0) + (raw.get(key) or 0)
+        return self._mode_stats(total), {m: self._mode_stats(raw) for m, raw in modes_raw.items()}
+
+    def get_user_stats(self, uid: str, days: int = 7) -> UserStats:
+        """Summary doc + last `days` daily rollups: two reads regardless of history size."""
+        stats_ref = self.db.collection("stats").document(uid)
+        data = stats_ref.get().to_dict() or {}
+        telemetry.firestore_op("get")
+        daily: List[DailyStats] = []
+        if days > 0:
+            q = stats_ref.collection("daily").order_by("date", direction="DESCENDING").limit(days)
+            for d in q.stream():
+                raw = d.to_dict() or {}
+                d_total, d_modes = self._rollup(raw.get("modes") or {})
+                daily.append(DailyStats(date=raw.get("date", d.id), total=d_total, modes=d_modes))
+            telemetry.firestore_op("query")
+        total, modes = self._rollup(data.get("modes") or {})
+        return UserStats(uid=uid, total=total, modes=modes, daily=daily)
 
     def get_user_history(self, uid: str, limit: int = 20) -> List[HistoryItem]:
+        return self.get_user_history_page(uid, limit=limit)[0]
+
+    def get_user_history_page(
+        self, uid: str, limit: int = 20, cursor: Optional[str] = None, summary: bool = False,
+    ) -> Tuple[List[Union[HistoryItem, HistorySummary]], Optional[str]]:
+        """
+        Newest-first page of `histories/{uid}/items` starting after `cursor`.
+        Ordered by (created_at, doc id) so the cursor is stable under equal timestamps.
+        `summary` projects away the original/rewrite bodies.
+        Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        from google.cloud.firestore_v1.field_path import FieldPath
         q = (self.db.collection("histories").document(uid).collection("items")
-             .order_by("created_at", direction="DESCENDING").limit(limit))
-        return [HistoryItem(id=d.id, **d.to_dict()) for d in q.stream()]
+             .order_by("created_at", direction="DESCENDING")
+             .order_by(FieldPath.document_id(), direction="DESCENDING"))
+        if summary:
+            q = q.select(HISTORY_SUMMARY_FIELDS)
+        if cursor:
+            created_at, doc_id = decode_cursor(cursor)
+            q = q.start_after({"created_at": created_at, FieldPath.document_id(): doc_id})
+        # one extra doc tells us whether another page exists
+        docs = list(q.limit(limit + 1).stream())
+        telemetry.firestore_op("query")
+        model = HistorySummary if summary else HistoryItem
+        items = [model(id=d.id, **(d.to_dict() or {})) for d in docs[:limit]]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if len(docs) > limit else None
+        return items, next_cursor
+
+    def iter_user_history(self, uid: str, page_size: int = 500, summary: bool = False) -> Iterator[Dict[str, Any]]:
+        """All history items for `uid`, newest first, fetched page by page."""
+        cursor = None
+        while True:
+            items, cursor = self.get_user_history_page(uid, limit=page_size, cursor=cursor, summary=summary)
+            for item in items:
+                yield item.model_dump()
+            if cursor is None:
+                return
 
     def get_leaderboard(self, limit: int = 50) -> List[LeaderboardEntry]:
-        q = self.db.collection("users").order_by("points", direction="DESCENDING").limit(limit).stream()
-        return [LeaderboardEntry(uid=d.id,
-                                 name=(d.to_dict() or {}).get("name"),
-                                 photo_url=(d.to_dict() or {}).get("photo_url"),
-                                 points=(d.to_dict() or {}).get("points", 0))
-                for d in q]
+        # served from the in-process materialized view; see services/leaderboard.py
+        return get_materialized_leaderboard().top(limit)
 
-    def handle_submission(
-        self,
-        uid: str,
-        display_name: str,
-        photo_url: str,
-        mode: str,
-        original: str,
-        rewrite: str,
-        scorer: BiasService,
-    ) -> RewriteResponse:
+    def build_history_item(self, mode: str, original: str, rewrite: str,
+                           original_p: float, rewrite_p: float, bias_type: str) -> Dict[str, Any]:
         """
         ABSOLUTE ONLY:
           - Get 0..1 from model
           - Scale to 0..100 exactly once
           - Pass when rewrite_score_100 <= ABSOLUTE_THRESHOLD
         """
-        original_p = scorer.score01(original)          # 0..1
-        rewrite_p  = scorer.score01(rewrite)           # 0..1
-        original_score = round(original_p * 100.0, 2)  # 0..100
-        rewrite_score  = round(rewrite_p * 100.0, 2)   # 0..100
-        delta = round(original_score - rewrite_score, 2)
-
-        threshold = float(settings.BIAS_ABSOLUTE_THRESHOLD)
-        passed = rewrite_score <= threshold
-        points_awarded = 10 if passed else 0
-
-        # persist history
-        hist_ref = self.db.collection("histories").document(uid).collection("items").document()
-        item = {
+        verdict = score_verdict(original_p, rewrite_p)
+        return {
             "mode": mode,
-            "bias_type": scorer.type_from_mode(mode),
+            "bias_type": bias_type,
             "original": original,
             "rewrite": rewrite,
-            "original_score": original_score,  # 0..100
-            "rewrite_score": rewrite_score,    # 0..100
-            "delta": delta,
-            "points_awarded": points_awarded,
+            "original_score": verdict["original_score"],  # 0..100
+            "rewrite_score": verdict["rewrite_score"],    # 0..100
+            "delta": verdict["delta"],
+            "points_awarded": verdict["points_awarded"],
             "created_at": now_iso(),
             "pass_mode": "absolute",
-            "threshold": threshold,
-            "passed": passed,
+            "threshold": verdict["threshold"],
+            "passed": verdict["passed"],
         }
-        hist_ref.set(item, merge=True)
-
-        # ensure user + award points
-        self.ensure_user_document({"uid": uid, "name": display_name, "picture": photo_url})
-        if points_awarded:
-            self.update_points(uid, points_awarded)
 
+    @staticmethod
+    def submission_response(item: Dict[str, Any], history_id: str) -> RewriteResponse:
         return RewriteResponse(
             success=True,
             bias_type=item["bias_type"],
-            original_score=original_score,
-            rewrite_score=rewrite_score,
-            delta=delta,
-            threshold=threshold,
-            points_awarded=points_awarded,
-            history_item=HistoryItem(id=hist_ref.id, **item),
+            original_score=item["original_score"],
+            rewrite_score=item["rewrite_score"],
+            delta=item["delta"],
+            threshold=item["threshold"],
+            points_awarded=item["points_awarded"],
+            history_item=HistoryItem(id=history_id, **item),
         )
+
+    def handle_submission(
+        self,
+        uid: str,
+        display_name: str,
+        photo_url: str,
+        mode: str,
+        original: str,
+        rewrite: str,
+        scorer: BiasScorer,
+    ) -> RewriteResponse:
+        """Sequential path: score both texts in one pass, persist history, award points."""
+        original_p, rewrite_p = scorer.score_many([original, rewrite])  # 0..1, one pass
+        item = self.build_history_item(mode, original, rewrite, original_p, rewrite_p,
+                                       scorer.type_from_mode(mode))
+
+        # persist history + ensure user + award points in one commit
+        create_fields = self.user_create_fields(uid, display_name, photo_url)
+        history_id = self.persist_submission(uid, item, create_fields)
+
+        return self.submission_response(item, history_id)
@@ -0,0 +1,89 @@
+"""
+Inference backends for BiasService. Each builder returns a
+TextClassificationPipeline so scoring code does not care which runtime is used.
+
+  - "pytorch":   full-precision transformers model (default, reference scores)
+  - "quantized": PyTorch dynamic int8 quantization of Linear layers (CPU)
+  - "onnx":      ONNX Runtime via optimum (optional dependency: optimum[onnxruntime])
+
+Parity check against the reference backend:
+    python -m app.services.inference --backend onnx
+    python -m pytest tests/test_inference_parity.py   # same check as a test
+"""
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:  # transformers takes seconds to import; load it with the model, not with the app
+    from transformers import TextClassificationPipeline
+
+def _pytorch(model_name: str) -> "TextClassificationPipeline":
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, TextClassificationPipeline
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    tok = AutoTokenizer.from_pretrained(model_name)
+    return TextClassificationPipeline(model=model, tokenizer=tok, return_all_scores=True)
+
+def _quantized(model_name: str) -> "TextClassificationPipeline":
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, TextClassificationPipeline
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tok = AutoTokenizer.from_pretrained(model_name)
+    return TextClassificationPipeline(model=model, tokenizer=tok, return_all_scores=True)
+
+def _onnx(model_name: str) -> "TextClassificationPipeline":
+    from transformers import AutoTokenizer, TextClassificationPipeline
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError as e:
+        raise RuntimeError("BIAS_BACKEND=onnx requires `optimum[onnxruntime]`.") from e
+    from app.core.config import settings
+    # Why: exporting takes seconds; reuse a pre-exported dir when one is configured
+    src = settings.BIAS_ONNX_PATH or model_name
+    model = ORTModelForSequenceClassification.from_pretrained(src, export=not settings.BIAS_ONNX_PATH)
+    tok = AutoTokenizer.from_pretrained(src)
+    return TextClassificationPipeline(model=model, tokenizer=tok, return_all_scores=True)
+
+BACKENDS: Dict[str, Callable[[str], "TextClassificationPipeline"]] = {
+    "pytorch": _pytorch,
+    "quantized": _quantized,
+    "onnx": _onnx,
+}
+
+def build_pipeline(model_name: str, backend: Optional[str] = None) -> "TextClassificationPipeline":
+    from app.core.config import settings
+    name = (backend or settings.BIAS_BACKEND or "pytorch").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown BIAS_BACKEND '{name}' (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[name](model_name)
+
+PARITY_TEXTS = [
+    "Girls are not good at math, so they should stick to art.",
+    "Everyone can be good at math with practice.",
+    "Old people can't learn how to use computers.",
+    "People of any age can learn new technology.",
+    "Boys shouldn't cry or show their feelings.",
+]
+
+def check_parity(backend: str, model_name: Optional[str] = None, texts: Optional[List[str]] = None,
+                 tolerance: float = 0.02) -> Dict[str, float]:
+    """Score `texts` with the reference pipeline and `backend`; raise if any probability drifts past `tolerance`."""
+    from app.core.config import settings
+    from app.services.bias import BiasService
+    model_name = model_name or settings.BIAS_MODEL_NAME
+    texts = texts or PARITY_TEXTS
+    ref = _pytorch(model_name)(texts)
+    cand = build_pipeline(model_name, backend)(texts)
+    diffs = [abs(BiasService._pick(a) - BiasService._pick(b)) for a, b in zip(ref, cand)]
+    worst = max(diffs)
+    if worst > tolerance:
+        raise AssertionError(f"{backend}: max |Δp| {worst:.4f} exceeds tolerance {tolerance}")
+    return {"max_abs_diff": round(worst, 4), "mean_abs_diff": round(sum(diffs) / len(diffs), 4)}
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Compare a BiasService backend against the PyTorch reference.")
+    ap.add_argument("--backend", default="quantized", choices=sorted(BACKENDS))
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--tolerance", type=float, default=0.02)
+    args = ap.parse_args()
+    print(check_parity(args.backend, args.model, tolerance=args.tolerance))
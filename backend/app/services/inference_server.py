@@ -0,0 +1,222 @@
+"""
+Shared out-of-process classifier.
+
+One inference process loads the model once per node; every uvicorn worker talks
+to it over a local socket through RemoteBiasService, which keeps the BiasService
+interface (score01 / score_many / ...). Because all workers feed the server's
+micro-batcher, batches form across workers too.
+
+Run the server next to the API workers:
+    python -m app.services.inference_server --address /tmp/bias-trainer.sock
+and point the API at it with BIAS_SERVER_ADDRESS=/tmp/bias-trainer.sock
+(or host:port for TCP on a loopback address).
+
+Both sides need the same non-default BIAS_SERVER_AUTHKEY. Messages are JSON
+frames, never pickles, so a peer that gets past the handshake still cannot
+run code in the other process.
+"""
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.services.bias import BiasScorer, BiasService
+
+log = logging.getLogger(__name__)
+
+Address = Union[str, Tuple[str, int]]
+
+# values that have shipped in docs/examples; anyone could know them
+_PUBLIC_AUTHKEYS = {"", "bias-trainer", "change-me"}
+
+def parse_address(address: str) -> Address:
+    """'/path/to.sock' -> unix socket; 'host:port' -> TCP, loopback hosts only."""
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        host = host.strip("[]") or "127.0.0.1"
+        if host != "localhost":
+            try:
+                loopback = ipaddress.ip_address(host).is_loopback
+            except ValueError:
+                loopback = False
+            if not loopback:
+                raise ValueError(f"BIAS_SERVER_ADDRESS must be a unix socket or a loopback host:port, got {address!r}")
+        return host, int(port)
+    return address
+
+def require_authkey(authkey: Optional[str] = None) -> bytes:
+    key = settings.BIAS_SERVER_AUTHKEY if authkey is None else authkey
+    if key in _PUBLIC_AUTHKEYS:
+        raise RuntimeError("BIAS_SERVER_AUTHKEY must be set to a private value to use the inference server")
+    return key.encode("utf-8")
+
+def _send(conn: Connection, obj: Any) -> None:
+    conn.send_bytes(json.dumps(obj).encode("utf-8"))
+
+def _recv(conn: Connection) -> Any:
+    return json.loads(conn.recv_bytes().decode("utf-8"))
+
+# ---------- server ----------
+
+def _serve_connection(conn: Connection, service: BiasService) -> None:
+    with conn:
+        while True:
+            try:
+                msg = _recv(conn)
+            except (EOFError, OSError):
+                return
+            except ValueError:
+                log.warning("dropping inference connection: malformed frame")
+                return
+            try:
+                op = msg.get("op")
+                if op == "score_many":
+                    res: Any = service.score_many([str(t) for t in msg["texts"]])
+                elif op == "score_uncached":
+                    res = service.score_uncached([str(t) for t in msg["texts"]])
+                elif op == "model_key":
+                    res = service.model_key()
+                elif op == "stats":
+                    res = service.cache_stats()
+                elif op == "flight_stats":
+                    res = service.flight_stats()
+                elif op == "ping":
+                    res = "pong"
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+                _send(conn, ["ok", res])
+            except Exception as e:
+                _send(conn, ["error", f"{type(e).__name__}: {e}"])
+
+def serve(address: str, authkey: bytes) -> None:
+    addr = parse_address(address)
+    if isinstance(addr, str):
+        os.makedirs(os.path.dirname(os.path.abspath(addr)), exist_ok=True)
+    if isinstance(addr, str) and os.path.exists(addr):
+        os.unlink(addr)  # stale socket from a previous run
+    service = BiasService()
+    service.warmup()
+    with Listener(addr, authkey=authkey) as listener:
+        if isinstance(addr, str):
+            os.chmod(addr, 0o600)  # only the API's user may connect
+        log.info("bias inference server listening on %s", address)
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # e.g. AuthenticationError from a bad client; keep serving others
+                log.warning("rejected inference connection: %s", e)
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, service),
+                             name="bias-conn", daemon=True).start()
+
+# ---------- client ----------
+
+class RemoteBiasService(BiasScorer):
+    """BiasScorer that forwards scoring to the shared inference server."""
+    def __init__(self, address: Optional[str] = None, authkey: Optional[bytes] = None,
+                 timeout_s: Optional[float] = None):
+        self._address = parse_address(address or settings.BIAS_SERVER_ADDRESS)
+        self._authkey = authkey or require_authkey()
+        self._timeout = timeout_s if timeout_s is not None else settings.BIAS_SERVER_TIMEOUT_S
+        # Connection objects are not thread-safe: one per calling thread
+        self._local = threading.local()
+        self._model_key: Optional[str] = None
+
+    def _conn(self) -> Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self._address, authkey=self._authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, op: str, **kwargs) -> Any:
+        for attempt in range(2):
+            try:
+                conn = self._conn()
+                _send(conn, {"op": op, **kwargs})
+                if not conn.poll(self._timeout):
+                    self._drop()  # a late reply would desync the stream
+                    raise TimeoutError(f"inference server did not answer '{op}' within {self._timeout}s")
+                status, res = _recv(conn)
+            except TimeoutError:
+                # the server is alive but slow: resending would double its work and our wait
+                raise
+            except (EOFError, OSError, ConnectionError):
+                # server restarted or socket went away: reconnect once
+                self._drop()
+                if attempt:
+                    raise
+                continue
+            if status != "ok":
+                raise RuntimeError(f"inference server: {res}")
+            return res
+
+    def warmup(self) -> None:
+        """Wait until the inference server answers (it loads the model itself)."""
+        deadline = time.monotonic() + settings.BIAS_SERVER_WAIT_S
+        while True:
+            try:
+                self._call("ping")
+                return
+            except (OSError, EOFError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def score_many(self, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        return self._call("score_many", texts=list(texts))
+
+    def score_uncached(self, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        return self._call("score_uncached", texts=list(texts))
+
+    def model_key(self) -> str:
+        # the server's model, not this worker's settings
+        if self._model_key is None:
+            self._model_key = self._call("model_key")
+        return self._model_key
+
+    def cache_stats(self) -> Dict[str, float]:
+        try:
+            return self._call("stats")
+        except Exception:
+            return {}
+
+    def flight_stats(self) -> Dict[str, float]:
+        # coalescing happens in the server, across all workers
+        try:
+            return self._call("flight_stats")
+        except Exception:
+            return {}
+
+def create_bias_service() -> BiasScorer:
+    """In-process model by default; shared inference server when BIAS_SERVER_ADDRESS is set."""
+    if settings.BIAS_SERVER_ADDRESS:
+        return RemoteBiasService()
+    return BiasService()
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(description="Run the shared BiasService inference server.")
+    ap.add_argument("--address", default=settings.BIAS_SERVER_ADDRESS or "/tmp/bias-trainer.sock")
+    args = ap.parse_args()
+    serve(args.address, require_authkey())
@@ -0,0 +1,253 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import telemetry
+from app.core.config import settings
+from app.schemas.leaderboard import LeaderboardEntry
+
+log = logging.getLogger(__name__)
+
+class MaterializedLeaderboard:
+    """
+    In-process view of the top `size` users by points.
+    Kept current by `apply()` on every points increment in this process and
+    reconciled against Firestore once it is older than `ttl_s` (which also
+    picks up increments made by other workers). A reconcile costs one
+    `size`-doc query plus one count() aggregation, whatever the number of
+    users; leaderboard reads are served from memory.
+
+    Increments carry their commit time; one the current snapshot already read
+    (committed at or before its read time) is skipped, so nothing is counted
+    twice. An increment for a user outside the view cannot be placed (their
+    total is unknown), so it triggers a reconcile, at most once per
+    `min_refresh_s`, in case it lifted them into the top `size`.
+
+    `_keys` holds (-points, uid) in ascending order, i.e. best first, so
+    rank lookup is a bisect: rank = 1 + number of users with more points.
+    Users below the top `size` are ranked with a count() aggregation.
+    """
+    def __init__(self, ttl_s: float = 60.0, size: int = 200, min_refresh_s: float = 5.0, db=None):
+        self._ttl = float(ttl_s)
+        self._min_refresh = min(float(min_refresh_s), self._ttl)
+        self._size = max(1, int(size))
+        self._db = db
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._keys: List[Tuple[int, str]] = []
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._users = 0  # total users at the last reconcile
+        self._complete = False  # True while the view holds every user
+        self._loaded_at: Optional[float] = None
+        self._read_time: Optional[datetime] = None  # Firestore read time of the current snapshot
+        self._refreshing = False
+        self._dirty = False  # an increment for a user outside the view was dropped
+        # increments applied while a reconcile is reading; replayed onto its snapshot if it missed them
+        self._pending: Optional[List[Tuple[Any, ...]]] = None
+
+    # ---------- reads ----------
+
+    def top(self, limit: int = 50) -> List[LeaderboardEntry]:
+        self._fresh()
+        with self._lock:
+            return [self._entry(uid) for _, uid in self._keys[:max(0, limit)]]
+
+    def rank(self, uid: str, points: Optional[int] = None) -> Optional[int]:
+        """Rank of `uid`; pass the user's `points` to rank users outside the top `size`."""
+        self._fresh()
+        with self._lock:
+            row = self._rows.get(uid)
+            if row is not None:
+                return self._rank_for(row["points"])
+            if points is None:
+                return None
+            if self._complete:
+                return self._rank_for(int(points))
+        return self._count_above(int(points)) + 1
+
+    def stats(self) -> Dict[str, float]:
+        age = time.monotonic() - self._loaded_at if self._loaded_at is not None else -1.0
+        return {"users": self._users, "rows": len(self._rows), "age_s": round(age, 1)}
+
+    # ---------- writes ----------
+
+    def apply(self, uid: str, delta_points: int = 0, name: Optional[str] = None,
+              photo_url: Optional[str] = None, created: bool = False,
+              committed_at: Optional[datetime] = None) -> None:
+        """
+        Mirror a committed points increment (and optional profile fields).
+        `created` means the commit created the user doc, so `delta_points` is
+        the user's whole total. `committed_at` is the commit's update_time.
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((uid, delta_points, name, photo_url, created, committed_at))
+            if self._read_time is not None and committed_at is not None and committed_at <= self._read_time:
+                return  # already in the snapshot
+            self._apply(uid, delta_points, name, photo_url, created)
+            schedule = self._dirty and self._due(self._min_refresh)
+        if schedule:
+            self._schedule()
+
+    def set_profile(self, uid: str, name: Optional[str] = None, photo_url: Optional[str] = None) -> None:
+        with self._lock:
+            row = self._rows.get(uid)
+            if row is None:
+                return
+            if name is not None:
+                row["name"] = name
+            if photo_url is not None:
+                row["photo_url"] = photo_url
+
+    def reconcile(self) -> None:
+        """Replace the in-memory view with a fresh read of the top users."""
+        with self._reconcile_lock:
+            with self._lock:
+                self._pending = []
+                self._dirty = False
+            try:
+                rows, users, read_time = self._read_top()
+            except BaseException:
+                with self._lock:
+                    self._pending = None
+                raise
+            keys = sorted((-r["points"], uid) for uid, r in rows.items())
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._rows, self._keys = rows, keys
+                self._users = users
+                self._complete = users <= len(rows)
+                self._read_time = read_time
+                for uid, delta, name, photo_url, created, committed_at in pending:
+                    # replay only what the read cannot have seen; unknown commit times are left
+                    # to the next reconcile rather than risk counting them twice
+                    if read_time is None or (committed_at is not None and committed_at > read_time):
+                        self._apply(uid, delta, name, photo_url, created)
+                self._loaded_at = time.monotonic()
+
+    # ---------- internals ----------
+
+    def _client(self):
+        if self._db is None:
+            from app.core.firebase import get_db
+            self._db = get_db()
+        return self._db
+
+    def _read_top(self) -> Tuple[Dict[str, Dict[str, Any]], int, Optional[datetime]]:
+        """(top rows, total users, read time); read time is None when no user exists yet."""
+        users = self._client().collection("users")
+        rows: Dict[str, Dict[str, Any]] = {}
+        read_time = None
+        q = (users.order_by("points", direction="DESCENDING")
+             .limit(self._size)
+             .select(["name", "photo_url", "points"]))
+        for d in q.stream():
+            read_time = read_time or d.read_time
+            data = d.to_dict() or {}
+            rows[d.id] = {
+                "points": int(data.get("points") or 0),
+                "name": data.get("name"),
+                "photo_url": data.get("photo_url"),
+            }
+        telemetry.firestore_op("query")
+        if len(rows) < self._size:
+            return rows, len(rows), read_time
+        total = users.count().get()[0][0].value
+        telemetry.firestore_op("aggregate")
+        return rows, int(total), read_time
+
+    def _count_above(self, points: int) -> int:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        q = self._client().collection("users").where(filter=FieldFilter("points", ">", points))
+        n = q.count().get()[0][0].value
+        telemetry.firestore_op("aggregate")
+        return int(n)
+
+    def _apply(self, uid: str, delta_points: int, name: Optional[str], photo_url: Optional[str],
+               created: bool) -> None:
+        row = self._rows.get(uid)
+        if row is None:
+            # outside the view: its total is unknown unless the view holds everyone or the user is new
+            if not (created or self._complete):
+                if delta_points > 0:
+                    self._dirty = True  # they may have climbed into the top `size`
+                return
+            row = {"points": 0, "name": None, "photo_url": None}
+            self._rows[uid] = row
+            if created:
+                self._users += 1
+        else:
+            self._remove_key(uid, row["points"])
+        row["points"] += int(delta_points)
+        if name is not None:
+            row["name"] = name
+        if photo_url is not None:
+            row["photo_url"] = photo_url
+        bisect.insort(self._keys, (-row["points"], uid))
+        while len(self._keys) > self._size:
+            _, dropped = self._keys.pop()
+            del self._rows[dropped]
+            self._complete = False
+
+    def _fresh(self) -> None:
+        if self._loaded_at is None:
+            # first load: reads wait for it; apply() does not, it only takes _lock
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.reconcile()
+            return
+        with self._lock:
+            stale = self._due(self._ttl) or (self._dirty and self._due(self._min_refresh))
+        if stale:
+            self._schedule()
+
+    def _due(self, age_s: float) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at >= age_s
+
+    def _schedule(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        # Why: serve the slightly stale view while the refresh runs
+        threading.Thread(target=self._background_reconcile, name="leaderboard-reconcile", daemon=True).start()
+
+    def _background_reconcile(self) -> None:
+        try:
+            self.reconcile()
+        except Exception:
+            log.exception("leaderboard reconcile failed")
+            with self._lock:
+                self._loaded_at = time.monotonic()  # back off for one TTL
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _rank_for(self, points: int) -> int:
+        return bisect.bisect_left(self._keys, (-points,)) + 1
+
+    def _remove_key(self, uid: str, points: int) -> None:
+        i = bisect.bisect_left(self._keys, (-points, uid))
+        if i < len(self._keys) and self._keys[i] == (-points, uid):
+            del self._keys[i]
+
+    def _entry(self, uid: str) -> LeaderboardEntry:
+        row = self._rows[uid]
+        return LeaderboardEntry(uid=uid, name=row["name"], photo_url=row["photo_url"],
+                                points=row["points"], rank=self._rank_for(row["points"]))
+
+_board: Optional[MaterializedLeaderboard] = None
+_board_lock = threading.Lock()
+
+def get_leaderboard() -> MaterializedLeaderboard:
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                _board = MaterializedLeaderboard(ttl_s=settings.LEADERBOARD_TTL_S, size=settings.LEADERBOARD_SIZE,
+                                                 min_refresh_s=settings.LEADERBOARD_MIN_REFRESH_S)
+    return _board
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.core import telemetry
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., Awaitable[Any]]  # called with the results of `deps` as keyword args
+    deps: Tuple[str, ...] = ()
+
+@dataclass
+class StageGraph:
+    """
+    Tiny async dependency graph: every stage starts as soon as its deps finish,
+    so wall time is the longest chain rather than the sum of all stages.
+    Stages must be added after their deps, which keeps the graph acyclic.
+    """
+    stages: Dict[str, Stage] = field(default_factory=dict)
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], *deps: str) -> "StageGraph":
+        if name in self.stages:
+            raise ValueError(f"duplicate stage '{name}'")
+        for d in deps:
+            if d not in self.stages:
+                raise ValueError(f"stage '{name}' depends on unknown stage '{d}'")
+        self.stages[name] = Stage(name, fn, tuple(deps))
+        return self
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Return (results by stage, duration in ms by stage + 'total')."""
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+        t_start = time.perf_counter()
+
+        async def run_stage(stage: Stage) -> Any:
+            if stage.deps:
+                await asyncio.gather(*(tasks[d] for d in stage.deps))
+            inputs = {d: tasks[d].result() for d in stage.deps}
+            t0 = time.perf_counter()
+            try:
+                with telemetry.span(f"stage:{stage.name}"):
+                    return await stage.fn(**inputs)
+            finally:
+                timings[stage.name] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+        # all tasks exist before any of them gets scheduled, so deps always resolve
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage), name=f"stage:{stage.name}")
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for t in tasks.values():
+                t.cancel()
+            raise
+        timings["total"] = round((time.perf_counter() - t_start) * 1000.0, 2)
+        return {n: t.result() for n, t in tasks.items()}, timings
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
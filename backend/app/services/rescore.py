@@ -0,0 +1,284 @@
+"""
+Offline bulk re-scoring of past turns under another model or threshold.
+
+Streams every `histories/{uid}/items/{id}` doc out of Firestore in pages
+(collection-group query ordered by document path), scores originals and
+rewrites with BiasService in large batches across a process pool, and writes
+one row per item either to Parquet (one part file per page) or back onto the
+item under `rescore.<tag>`. A checkpoint is saved after each page; running the
+same command again resumes after the last finished page. Runs entirely outside
+the API processes.
+
+    python -m app.services.rescore --out rescore/roberta --model unitary/unbiased-toxic-roberta
+    python -m app.services.rescore --out rescore/t20 --threshold 20 --sink firestore --tag t20
+
+Parquet output needs `pyarrow`.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core import telemetry
+from app.core.config import settings
+from app.services.bias import BiasService
+from app.services.firestore import now_iso, score_verdict
+
+log = logging.getLogger(__name__)
+
+ITEM_FIELDS = ["mode", "original", "rewrite", "original_score", "rewrite_score",
+               "points_awarded", "passed", "created_at"]
+
+# ---------- source ----------
+
+def iter_history_pages(db, page_size: int, after_path: Optional[str] = None) -> Iterator[Tuple[List[Any], str]]:
+    """
+    Yield (docs, last_path) per page of all history items, ordered by full
+    document path so `last_path` is a stable resume point.
+    """
+    from google.cloud.firestore_v1.field_path import FieldPath
+    base = (db.collection_group("items")
+            .order_by(FieldPath.document_id())
+            .select(ITEM_FIELDS))
+    after = db.document(after_path) if after_path else None
+    while True:
+        q = base.start_after({FieldPath.document_id(): after}) if after is not None else base
+        raw = list(q.limit(page_size).stream())
+        telemetry.firestore_op("query")
+        if not raw:
+            return
+        # other subcollections may also be called "items"; keep only histories/*
+        docs = [d for d in raw if d.reference.path.startswith("histories/")]
+        yield docs, raw[-1].reference.path
+        if len(raw) < page_size:
+            return
+        after = raw[-1].reference
+
+# ---------- scoring ----------
+
+_worker: Optional[BiasService] = None
+
+def _scoring_overrides(chunk: int) -> Dict[str, Any]:
+    """Settings for bulk scoring: one big padded pass per chunk, no micro-batcher, no shared SQLite cache."""
+    return {"BIAS_MICROBATCH": False, "BIAS_CACHE_PATH": "", "BIAS_BATCH_MAX_SIZE": min(chunk, 128)}
+
+def _build_service(model_name: str, overrides: Dict[str, Any]) -> BiasService:
+    # BiasService reads settings only in its constructor, so the overrides can be undone right after
+    saved = {name: getattr(settings, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        return BiasService(model_name)
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+def _init_worker(model_name: str, threads: int, overrides: Dict[str, Any]) -> None:
+    global _worker
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+    _worker = _build_service(model_name, overrides)
+
+def _score_chunk(texts: List[str]) -> List[float]:
+    return _worker.score_many(texts)
+
+def score_texts(pool: Optional[Executor], service: Optional[BiasService], texts: List[str],
+                chunk: int) -> Dict[str, float]:
+    """Score unique `texts`; chunks go to the pool in parallel, or run in-process without one."""
+    chunks = [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+    if pool is None:
+        results = [service.score_many(c) for c in chunks]
+    else:
+        results = [f.result() for f in [pool.submit(_score_chunk, c) for c in chunks]]
+    return {t: p for c, r in zip(chunks, results) for t, p in zip(c, r)}
+
+def _opt(cast, value):
+    return cast(value) if value is not None else None
+
+def rescore_row(path: str, data: Dict[str, Any], scores: Dict[str, float], threshold: float,
+                model_name: str) -> Optional[Dict[str, Any]]:
+    original, rewrite = data.get("original"), data.get("rewrite")
+    if not isinstance(original, str) or not isinstance(rewrite, str):
+        return None
+    _, uid, _, item_id = path.split("/")
+    verdict = score_verdict(scores[original], scores[rewrite], threshold)
+    return {
+        "path": path,
+        "uid": uid,
+        "item_id": item_id,
+        "mode": data.get("mode"),
+        "created_at": data.get("created_at"),
+        "model": model_name,
+        "old_original_score": _opt(float, data.get("original_score")),
+        "old_rewrite_score": _opt(float, data.get("rewrite_score")),
+        "old_passed": _opt(bool, data.get("passed")),
+        "old_points_awarded": _opt(int, data.get("points_awarded")),
+        **verdict,
+    }
+
+# ---------- sinks ----------
+
+class ParquetSink:
+    """One `part-NNNNNN.parquet` per page, written to a temp file and renamed, so resumes never see half a part."""
+    def __init__(self, out_dir: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("--sink parquet requires `pyarrow`.") from e
+        self._pa, self._pq = pa, pq
+        self._dir = out_dir
+        self._schema = pa.schema([
+            ("path", pa.string()), ("uid", pa.string()), ("item_id", pa.string()),
+            ("mode", pa.string()), ("created_at", pa.string()), ("model", pa.string()),
+            ("old_original_score", pa.float64()), ("old_rewrite_score", pa.float64()),
+            ("old_passed", pa.bool_()), ("old_points_awarded", pa.int64()),
+            ("original_score", pa.float64()), ("rewrite_score", pa.float64()), ("delta", pa.float64()),
+            ("threshold", pa.float64()), ("passed", pa.bool_()), ("points_awarded", pa.int64()),
+        ])
+
+    def write(self, page_no: int, rows: List[Dict[str, Any]]) -> None:
+        path = os.path.join(self._dir, f"part-{page_no:06d}.parquet")
+        table = self._pa.Table.from_pylist(rows, schema=self._schema)
+        self._pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+class FirestoreSink:
+    """Merge results onto each item as `rescore.<tag>`; user points are left alone."""
+    BATCH = 500  # Firestore's per-commit write limit
+
+    def __init__(self, db, tag: str):
+        self._db = db
+        self._tag = tag
+
+    def write(self, page_no: int, rows: List[Dict[str, Any]]) -> None:
+        for i in range(0, len(rows), self.BATCH):
+            batch = self._db.batch()
+            part = rows[i:i + self.BATCH]
+            for r in part:
+                result = {k: r[k] for k in ("model", "original_score", "rewrite_score", "delta",
+                                            "threshold", "passed", "points_awarded")}
+                result["at"] = now_iso()
+                batch.set(self._db.document(r["path"]), {"rescore": {self._tag: result}}, merge=True)
+            batch.commit()
+            telemetry.firestore_op("commit")
+
+# ---------- checkpoint ----------
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+# ---------- driver ----------
+
+def run(out_dir: str, model_name: str, threshold: float, sink_name: str = "parquet", tag: Optional[str] = None,
+        page_size: int = 2000, chunk: int = 256, workers: int = 0, threads: int = 1,
+        restart: bool = False, db=None) -> Dict[str, Any]:
+    os.makedirs(out_dir, exist_ok=True)
+    ckpt_path = os.path.join(out_dir, "_checkpoint.json")
+    job = {"model": model_name, "backend": settings.BIAS_BACKEND, "max_tokens": settings.BIAS_MAX_TOKENS,
+           "threshold": threshold, "sink": sink_name, "tag": tag}
+    state = None if restart else load_checkpoint(ckpt_path)
+    if state is not None and state["job"] != job:
+        raise RuntimeError(f"{ckpt_path} belongs to a different job {state['job']}; use --restart or another --out")
+    if state is None:
+        for name in os.listdir(out_dir):
+            if name.startswith("part-"):
+                os.remove(os.path.join(out_dir, name))  # parts from an earlier job would mix into the dataset
+        state = {"job": job, "last_path": None, "pages": 0, "items": 0, "skipped": 0,
+                 "old_passed": 0, "passed": 0, "flipped": 0, "done": False}
+    if state["done"]:
+        log.info("nothing to do: %s is already complete", out_dir)
+        return state
+
+    if db is None:
+        from app.core.firebase import get_db
+        db = get_db()
+    sink = FirestoreSink(db, tag) if sink_name == "firestore" else ParquetSink(out_dir)
+
+    pool: Optional[Executor] = None
+    service: Optional[BiasService] = None
+    # the same scoring setup in each worker and in-process
+    overrides = _scoring_overrides(chunk)
+    if workers > 0:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(model_name, threads, overrides))
+    else:
+        service = _build_service(model_name, overrides)
+
+    pages = iter_history_pages(db, page_size, state["last_path"])
+    fetcher = ThreadPoolExecutor(1, thread_name_prefix="rescore-fetch")
+    t0 = time.perf_counter()
+    n0 = state["items"]
+    try:
+        pending = fetcher.submit(next, pages, None)
+        while True:
+            page = pending.result()
+            if page is None:
+                break
+            docs, last_path = page
+            pending = fetcher.submit(next, pages, None)  # read page N+1 while page N is scored
+
+            items = [(d.reference.path, d.to_dict() or {}) for d in docs]
+            # samples repeat across players: score each distinct text once per page
+            texts = list(dict.fromkeys(
+                t for _, data in items for t in (data.get("original"), data.get("rewrite")) if isinstance(t, str)
+            ))
+            scores = score_texts(pool, service, texts, chunk)
+            rows = [r for r in (rescore_row(p, data, scores, threshold, model_name) for p, data in items)
+                    if r is not None]
+            if rows:
+                sink.write(state["pages"], rows)
+
+            state["pages"] += 1
+            state["items"] += len(rows)
+            state["skipped"] += len(docs) - len(rows)
+            state["old_passed"] += sum(1 for r in rows if r["old_passed"])
+            state["passed"] += sum(1 for r in rows if r["passed"])
+            state["flipped"] += sum(1 for r in rows if r["old_passed"] is not None and r["old_passed"] != r["passed"])
+            state["last_path"] = last_path
+            save_checkpoint(ckpt_path, state)
+            rate = (state["items"] - n0) / max(1e-9, time.perf_counter() - t0)
+            log.info("page %d: %d items total, %.0f items/s", state["pages"], state["items"], rate)
+        state["done"] = True
+        save_checkpoint(ckpt_path, state)
+    finally:
+        fetcher.shutdown(wait=False, cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return state
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True, help="output dir (Parquet parts + checkpoint)")
+    ap.add_argument("--model", default=settings.BIAS_MODEL_NAME)
+    ap.add_argument("--threshold", type=float, default=settings.BIAS_ABSOLUTE_THRESHOLD, help="0–100 pass threshold")
+    ap.add_argument("--sink", choices=["parquet", "firestore"], default="parquet")
+    ap.add_argument("--tag", default=None, help="field under `rescore.` for --sink firestore")
+    ap.add_argument("--page-size", type=int, default=2000, help="history items per Firestore page")
+    ap.add_argument("--chunk", type=int, default=256, help="texts per scoring task")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes (0 = in-process)")
+    ap.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = ap.parse_args()
+    if args.sink == "firestore" and not args.tag:
+        ap.error("--sink firestore needs --tag")
+    final = run(args.out, args.model, args.threshold, sink_name=args.sink, tag=args.tag,
+                page_size=args.page_size, chunk=args.chunk, workers=args.workers, threads=args.threads,
+                restart=args.restart)
+    print(json.dumps(final, indent=2))
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+class ProviderError(RuntimeError):
+    """Provider call failed. `retryable` marks 429/5xx/transport errors worth another attempt."""
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class ProviderUnavailable(ProviderError):
+    """No model could answer within the deadline (breakers open or retries exhausted); maps to 503."""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: `failures` errors in a row open it for
+    `cooldown_s`; after that one probe call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failures: int = 5, cooldown_s: float = 30.0):
+        self._threshold = max(1, int(failures))
+        self._cooldown = float(cooldown_s)
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+
+    @property
+    def state(self) -> int:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self._cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 when calls may go through now)."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._cooldown - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self._cooldown:
+            return False
+        # Why: a probe whose caller went away never reports back; let another one through after a cooldown
+        if self._probe_at is not None and now - self._probe_at < self._cooldown:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probe_at is not None or self._failures >= self._threshold:
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+
+class LatencyWindow:
+    """Recent successful call latencies, used to pick the hedging delay."""
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._min = min_samples
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self._min:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+        return ordered[idx]
+
+def backoff_s(attempt: int, base_s: float, cap_s: float) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0.0, min(cap_s, base_s * (2 ** attempt)))
+
+def parse_routes(raw: Dict[str, Any], default_model: str) -> Dict[str, List[str]]:
+    """Normalize {mode: model | [models]} into {mode: [primary, fallbacks...]} with a 'default' entry."""
+    routes: Dict[str, List[str]] = {}
+    for mode, models in (raw or {}).items():
+        lst = [models] if isinstance(models, str) else [m for m in models if m]
+        if lst:
+            routes[mode] = lst
+    routes.setdefault("default", [default_model])
+    return routes
+
+async def hedged(call: Callable[[], Awaitable[Any]], hedge_after: Optional[float], timeout: float,
+                 on_hedge: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Await `call()`; if it has not finished after `hedge_after` seconds, start a
+    second identical call and return whichever succeeds first. The loser is
+    cancelled. Raises asyncio.TimeoutError once `timeout` elapses.
+    """
+    if hedge_after is None or hedge_after >= timeout:
+        return await asyncio.wait_for(call(), timeout)
+    deadline = time.monotonic() + timeout
+    pending = {asyncio.ensure_future(call())}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return done.pop().result()
+        if on_hedge is not None:
+            on_hedge()
+        pending.add(asyncio.ensure_future(call()))
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    return t.result()
+                error = t.exception()
+        if error is not None and not pending:
+            raise error
+        raise asyncio.TimeoutError()
+    finally:
+        for t in pending:
+            t.cancel()
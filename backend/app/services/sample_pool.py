@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, get_args
+
+from app.schemas.chat import Mode
+from app.services.bias import BiasScorer
+from app.services.score_cache import normalize_text
+from app.services.vendors import ChatService
+
+log = logging.getLogger(__name__)
+
+class SamplePool:
+    """
+    Per-mode pool of pre-generated sample sentences.
+    A background task refills a mode back to `high` once it drops below `low`.
+    Samples are validated by ChatService.generate_sample, de-duplicated against
+    recent samples of the same mode, and pre-scored so /api/turn hits the score cache.
+    If a pool is empty, `get` falls back to a live provider call.
+    """
+    def __init__(self, chat: ChatService, scorer: Optional[BiasScorer] = None,
+                 low: int = 3, high: int = 10, concurrency: int = 2, modes: Optional[List[str]] = None):
+        self._chat = chat
+        self._scorer = scorer
+        self._low = max(0, int(low))
+        self._high = max(self._low + 1, int(high))
+        self._concurrency = max(1, int(concurrency))
+        self._modes = list(modes or get_args(Mode))
+        self._pools: Dict[str, Deque[str]] = {m: deque() for m in self._modes}
+        self._seen: Dict[str, "OrderedDict[str, None]"] = {m: OrderedDict() for m in self._modes}
+        self._seen_max = self._high * 20
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._refill_loop(), name="sample-pool-refill")
+        self._wake.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def get(self, mode: str) -> str:
+        pool = self._pools.get(mode)
+        if pool:
+            self.hits += 1
+            sentence = pool.popleft()
+            if len(pool) < self._low:
+                self._signal()
+            return sentence
+        self.misses += 1
+        self._signal()
+        return await self._chat.generate_sample(mode)
+
+    def sizes(self) -> Dict[str, int]:
+        return {m: len(p) for m, p in self._pools.items()}
+
+    def stats(self) -> Dict[str, float]:
+        out: Dict[str, float] = {"hits": self.hits, "misses": self.misses}
+        out.update({f"size:{m}": n for m, n in self.sizes().items()})
+        return out
+
+    # ---------- refill ----------
+
+    def _signal(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _refill_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            for mode in self._modes:
+                if len(self._pools[mode]) < self._low or not self._pools[mode]:
+                    try:
+                        await self._fill(mode)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        log.exception("sample pool refill failed for %s", mode)
+
+    async def _fill(self, mode: str) -> None:
+        pool = self._pools[mode]
+        empty_rounds = 0
+        while len(pool) < self._high and empty_rounds < 3:
+            need = min(self._concurrency, self._high - len(pool))
+            results = await asyncio.gather(
+                *[self._chat.generate_sample(mode) for _ in range(need)], return_exceptions=True
+            )
+            fresh = [s for s in results if isinstance(s, str) and self._remember(mode, s)]
+            for r in results:
+                if isinstance(r, Exception):
+                    log.warning("sample generation failed for %s: %s", mode, r)
+            if not fresh:
+                # Why: provider down or only duplicates — stop until the next wake-up
+                empty_rounds += 1
+                continue
+            if self._scorer is not None:
+                await asyncio.to_thread(self._scorer.score_many, fresh)
+            pool.extend(fresh)
+
+    def _remember(self, mode: str, sentence: str) -> bool:
+        key = normalize_text(sentence).lower()
+        seen = self._seen[mode]
+        if key in seen:
+            return False
+        seen[key] = None
+        while len(seen) > self._seen_max:
+            seen.popitem(last=False)
+        return True
@@ -0,0 +1,87 @@
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def normalize_text(text: str) -> str:
+    # Why: whitespace/Unicode-form variants tokenize identically, so share a slot
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+def text_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+class ScoreCache:
+    """
+    Content-addressed score cache: (model name, normalized text hash) -> probability.
+    In-memory LRU tier bounded by `max_entries`; optional SQLite tier at `path`
+    that survives restarts. Safe to share across threads.
+    """
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None):
+        self._max = max(0, int(max_entries))
+        self._mem: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL NOT NULL)")
+            self._db.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """Return the subset of `keys` that is cached; counts hits and misses."""
+        found: Dict[str, float] = {}
+        missing: List[str] = []
+        with self._lock:
+            for k in keys:
+                if k in self._mem:
+                    self._mem.move_to_end(k)
+                    found[k] = self._mem[k]
+                    self.hits += 1
+                else:
+                    missing.append(k)
+            if missing and self._db is not None:
+                marks = ",".join("?" * len(missing))
+                rows = self._db.execute(f"SELECT key, score FROM scores WHERE key IN ({marks})", missing).fetchall()
+                for k, score in rows:
+                    found[k] = float(score)
+                    self._put_mem(k, float(score))
+                    self.hits += 1
+                    self.disk_hits += 1
+            self.misses += sum(1 for k in missing if k not in found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, float]]) -> None:
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            for k, score in items:
+                self._put_mem(k, score)
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO scores (key, score) VALUES (?, ?)", items)
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._mem),
+            }
+
+    def _put_mem(self, key: str, score: float) -> None:
+        if self._max == 0:
+            return
+        self._mem[key] = score
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._max:
+            self._mem.popitem(last=False)
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+class SingleFlight:
+    """
+    Thread-side request coalescing: concurrent callers asking for the same key
+    share one computation. Callers `claim` keys, compute the ones they own,
+    then `resolve` (or `fail`) them; keys owned by someone else come back as
+    futures to wait on.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def claim(self, keys: Iterable[str]) -> Tuple[List[str], Dict[str, Future]]:
+        owned: List[str] = []
+        waiting: Dict[str, Future] = {}
+        with self._lock:
+            for k in keys:
+                fut = self._inflight.get(k)
+                if fut is None:
+                    self._inflight[k] = Future()
+                    owned.append(k)
+                    self.leaders += 1
+                else:
+                    waiting[k] = fut
+                    self.followers += 1
+        return owned, waiting
+
+    def resolve(self, results: Dict[str, Any]) -> None:
+        with self._lock:
+            futs = [(self._inflight.pop(k, None), v) for k, v in results.items()]
+        for fut, v in futs:
+            if fut is not None:
+                fut.set_result(v)
+
+    def fail(self, keys: Iterable[str], exc: BaseException) -> None:
+        with self._lock:
+            futs = [self._inflight.pop(k, None) for k in keys]
+        for fut in futs:
+            if fut is not None:
+                fut.set_exception(exc)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {"leaders": self.leaders, "followers": self.followers, "inflight": inflight}
+
+class AsyncSingleFlight:
+    """
+    Event-loop request coalescing: the first caller for a key starts `fn()` as a
+    task; concurrent callers with the same key await that same task. The task is
+    shielded, so one caller disconnecting does not cancel it for the others.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, float]:
+        return {"leaders": self.leaders, "followers": self.followers, "inflight": len(self._inflight)}
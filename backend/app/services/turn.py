@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.core import telemetry
+from app.schemas.chat import ChatMessage, Explanation
+from app.schemas.history import RewriteResponse
+from app.services.bias import BiasScorer
+from app.services.explain import Explainer
+from app.services.firestore import FirestoreService
+from app.services.pipeline import StageGraph
+from app.services.vendors import ChatService
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class TurnOutcome:
+    rewrite: str
+    result: RewriteResponse
+    timings: Dict[str, float]  # ms per stage + "total"
+    explanation: Optional[Explanation] = None
+
+async def run_turn(
+    chat: ChatService,
+    scorer: BiasScorer,
+    db: FirestoreService,
+    uid: str,
+    display_name: str,
+    photo_url: str,
+    mode: str,
+    original: str,
+    instruction: str,
+    messages: List[ChatMessage],
+    explainer: Optional[Explainer] = None,
+) -> TurnOutcome:
+    """
+    One /api/turn as a dependency graph:
+
+        score_original ─────────────┐
+        rewrite ──┬► score_rewrite ─┴► verdict ──┬──────────► explain (optional, overlaps persist)
+                  └► user ───────────────────────┴► persist (one batch commit)
+    """
+    async def rewrite():
+        return await chat.generate_constrained(mode, original, instruction, messages)
+
+    async def score_original():
+        return await asyncio.to_thread(scorer.score01, original)
+
+    async def score_rewrite(rewrite):
+        return await asyncio.to_thread(scorer.score01, rewrite)
+
+    async def verdict(rewrite, score_original, score_rewrite):
+        return db.build_history_item(mode, original, rewrite, score_original, score_rewrite,
+                                     scorer.type_from_mode(mode))
+
+    async def user(rewrite):
+        # existence check for create-if-missing; usually a cache hit, else one read overlapping the scoring.
+        # After `rewrite` so a failed LLM call never touches Firestore.
+        return await asyncio.to_thread(db.user_create_fields, uid, display_name, photo_url)
+
+    async def persist(verdict, user):
+        return await asyncio.to_thread(db.persist_submission, uid, verdict, user)
+
+    async def explain(verdict):
+        # best effort: by now the turn is scored and being saved; a missing explanation must not fail it
+        try:
+            return await asyncio.to_thread(explainer.explain_turn, mode, original, verdict["rewrite"],
+                                           verdict["passed"], verdict["threshold"])
+        except Exception:
+            log.exception("turn explanation failed")
+            return None
+
+    graph = (StageGraph()
+             .add("rewrite", rewrite)
+             .add("score_original", score_original)
+             .add("score_rewrite", score_rewrite, "rewrite")
+             .add("verdict", verdict, "rewrite", "score_original", "score_rewrite")
+             .add("user", user, "rewrite")
+             .add("persist", persist, "verdict", "user"))
+    if explainer is not None:
+        graph.add("explain", explain, "verdict")
+    results, timings = await graph.run()
+    telemetry.observe_stages(timings, prefix="turn.")
+    item = results["verdict"]
+    return TurnOutcome(
+        rewrite=results["rewrite"],
+        result=db.submission_response(item, results["persist"]),
+        timings=timings,
+        explanation=results.get("explain"),
+    )
@@ -1,6 +1,20 @@
 import os
-from typing import List, Dict
+import json
+import time
+import asyncio
+import hashlib
+from typing import AsyncIterator, List, Dict, Optional
+import httpx
+from app.core import telemetry
+from app.core.config import settings
 from app.schemas.chat import ChatMessage
+from app.services.resilience import (
+    CircuitBreaker, LatencyWindow, ProviderError, ProviderUnavailable, backoff_s, hedged, parse_routes,
+)
+from app.services.score_cache import normalize_text
+from app.services.singleflight import AsyncSingleFlight
+
+OPENROUTER_URL = f"{settings.OPENROUTER_BASE_URL.rstrip('/')}/chat/completions"
 
 def bias_from_mode(mode: str) -> str:
     if mode.startswith("gpt4"):
@@ -33,18 +47,31 @@ INSTRUCTION:
 {instruction}
 """
 
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    try:
+        return max(0.0, float(headers.get("retry-after", "")))
+    except ValueError:
+        return None  # HTTP-date form: fall back to our own backoff
+
 SYSTEM_SAFETY = (
     "Safety: Keep content appropriate for K–12. Avoid slurs, profanity, and explicit content."
 )
 
 class ChatService:
     """
-    All modes routed through OpenRouter → Claude 3.5 Sonnet (no fallbacks).
+    All modes routed through OpenRouter. The model per mode comes from
+    LLM_MODEL_ROUTES (first entry primary, the rest fallbacks; default
+    Claude 3.5 Sonnet). Every call has a total deadline, retries 429/5xx with
+    jittered backoff, skips models whose circuit breaker is open and can hedge
+    slow requests; when nothing can answer it raises ProviderUnavailable (503).
     Env required:
       - OPENROUTER_API_KEY
     Optional:
       - OPENROUTER_SITE_URL
       - OPENROUTER_APP_NAME
+    Async: one shared keep-alive connection pool per service; call `aclose()` on shutdown.
+    Identical concurrent rewrite calls share one provider request (SINGLEFLIGHT_ENABLED);
+    sample generation is never coalesced, since callers want distinct sentences.
     """
     def __init__(self):
         self.openrouter_key = os.getenv("OPENROUTER_API_KEY", "")
@@ -52,29 +79,82 @@ class ChatService:
             raise RuntimeError("OPENROUTER_API_KEY is required (no fallbacks).")
         self._or_site = os.getenv("OPENROUTER_SITE_URL", "")
         self._or_app = os.getenv("OPENROUTER_APP_NAME", "AI Bias Trainer")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._flight: Optional[AsyncSingleFlight] = AsyncSingleFlight() if settings.SINGLEFLIGHT_ENABLED else None
+        self._routes = parse_routes(settings.LLM_MODEL_ROUTES, settings.LLM_DEFAULT_MODEL)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+
+    def _http(self) -> httpx.AsyncClient:
+        # Why: reuse TCP/TLS connections across calls instead of a handshake per request
+        if self._client is None or self._client.is_closed:
+            headers = {
+                "Authorization": f"Bearer {self.openrouter_key}",
+                "Content-Type": "application/json",
+            }
+            if self._or_site:
+                headers["HTTP-Referer"] = self._or_site
+            if self._or_app:
+                headers["X-Title"] = self._or_app
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(settings.OPENROUTER_TIMEOUT_S, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    def flight_stats(self) -> Dict[str, float]:
+        return self._flight.stats() if self._flight is not None else {}
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     # ---------- Public API ----------
 
-    def generate(self, mode: str, messages: List[ChatMessage]) -> str:
+    async def generate(self, mode: str, messages: List[ChatMessage]) -> str:
         msgs = [{"role": m.role, "content": m.content} for m in messages]
         msgs.insert(0, {
             "role": "system",
             "content": f"{SYSTEM_SAFETY} You help kids rewrite biased sentences with minimal edits."
         })
-        return self._openrouter_chat(msgs, temperature=0.3)
+        return await self._openrouter_chat(msgs, mode=mode, temperature=0.3, coalesce=True)
 
-    def generate_sample(self, mode: str) -> str:
+    async def generate_sample(self, mode: str) -> str:
         bias = bias_from_mode(mode)
         system = f"{SYSTEM_SAFETY}\n\n" + SAMPLE_PROMPT.format(bias=bias)
         messages = [
             {"role": "system", "content": system},
             {"role": "user", "content": "Generate exactly one example sentence now."},
         ]
-        out = self._openrouter_chat(messages, temperature=0.3)
+        out = await self._openrouter_chat(messages, mode=mode, temperature=0.3)
         self._assert_valid_singleline(out, label="sampleSentence")
         return out
 
-    def generate_constrained(self, mode: str, original: str, instruction: str, messages: List[ChatMessage]) -> str:
+    async def generate_constrained(self, mode: str, original: str, instruction: str, messages: List[ChatMessage]) -> str:
+        base_msgs = self._constrained_messages(original, instruction, messages)
+        out = await self._openrouter_chat(base_msgs, mode=mode, temperature=0.2, coalesce=True)
+        self._assert_valid_singleline(out, label="chatConstrained")
+        return out
+
+    async def stream_constrained(self, mode: str, original: str, instruction: str, messages: List[ChatMessage]) -> AsyncIterator[str]:
+        """Yield rewrite text deltas as they arrive; validates the full text once the stream ends."""
+        base_msgs = self._constrained_messages(original, instruction, messages)
+        parts: List[str] = []
+        async for delta in self._openrouter_stream(base_msgs, mode=mode, temperature=0.2):
+            parts.append(delta)
+            yield delta
+        out = "".join(parts).strip()
+        if not out:
+            raise RuntimeError("OpenRouter returned empty content.")
+        self._assert_valid_singleline(out, label="chatConstrained")
+
+    @staticmethod
+    def _constrained_messages(original: str, instruction: str, messages: List[ChatMessage]) -> List[dict]:
         system = f"{SYSTEM_SAFETY}\n\n" + CONSTRAINED_PROMPT.format(
             original=original.strip(),
             instruction=instruction.strip()
@@ -83,47 +163,248 @@ class ChatService:
         for m in messages:
             base_msgs.append({"role": m.role, "content": m.content})
         base_msgs.append({"role": "user", "content": "Return only the revised sentence."})
-        out = self._openrouter_chat(base_msgs, temperature=0.2)
-        self._assert_valid_singleline(out, label="chatConstrained")
-        return out
+        return base_msgs
 
     # ---------- OpenRouter provider ----------
 
-    def _openrouter_chat(self, messages: List[dict], model: str = "anthropic/claude-3.5-sonnet", temperature: float = 0.2) -> str:
-        import requests
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_key}",
-            "Content-Type": "application/json",
-        }
-        if self._or_site:
-            headers["HTTP-Referer"] = self._or_site
-        if self._or_app:
-            headers["X-Title"] = self._or_app
+    def _models_for(self, mode: Optional[str]) -> List[str]:
+        return self._routes.get(mode or "default") or self._routes["default"]
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        b = self._breakers.get(model)
+        if b is None:
+            b = self._breakers[model] = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN_S)
+        return b
+
+    def _latency(self, model: str) -> LatencyWindow:
+        w = self._latencies.get(model)
+        if w is None:
+            w = self._latencies[model] = LatencyWindow()
+        return w
+
+    def _pick_model(self, models: List[str], attempt: int) -> Optional[str]:
+        # primary first; each retry rotates to the next model; skip models whose breaker is open
+        for i in range(len(models)):
+            model = models[(attempt + i) % len(models)]
+            if self._breaker(model).allow():
+                return model
+        return None
+
+    def _unavailable(self, models: List[str], last: Optional[ProviderError]) -> ProviderUnavailable:
+        retry_in = min(self._breaker(m).retry_in() for m in models)
+        retry_after = last.retry_after if last is not None and last.retry_after else retry_in
+        reason = f": {last}" if last is not None else f" (circuit open for {', '.join(models)})"
+        return ProviderUnavailable(f"OpenRouter unavailable{reason}", retryable=True,
+                                   retry_after=retry_after or None)
 
+    def _retry_delay(self, attempt: int, err: ProviderError) -> float:
+        if err.retry_after is not None:
+            return err.retry_after
+        return backoff_s(attempt, settings.LLM_RETRY_BASE_S, settings.LLM_RETRY_MAX_S)
+
+    def provider_stats(self) -> Dict[str, float]:
+        q = settings.LLM_HEDGE_PERCENTILE
+        out: Dict[str, float] = {}
+        for model, b in self._breakers.items():
+            out[f"breaker:{model}"] = b.state  # 0 closed, 1 half-open, 2 open
+            p = self._latency(model).percentile(q)
+            if p is not None:
+                out[f"p{q:g}_s:{model}"] = round(p, 3)
+        return out
+
+    @staticmethod
+    def _flight_key(messages: List[dict], models: List[str], temperature: float) -> str:
+        norm = [[m.get("role"), normalize_text(m.get("content") or "")] for m in messages]
+        raw = json.dumps([models, temperature, norm], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _openrouter_chat(self, messages: List[dict], mode: Optional[str] = None,
+                               temperature: float = 0.2, coalesce: bool = False) -> str:
+        models = self._models_for(mode)
+        if coalesce and self._flight is not None:
+            key = self._flight_key(messages, models, temperature)
+            return await self._flight.do(key, lambda: self._complete(messages, models, temperature))
+        return await self._complete(messages, models, temperature)
+
+    async def _complete(self, messages: List[dict], models: List[str], temperature: float) -> str:
+        """
+        One logical completion under a total deadline (LLM_DEADLINE_S): each attempt
+        is bounded by LLM_ATTEMPT_TIMEOUT_S, optionally hedged, and retryable
+        errors (429/5xx/transport/timeouts) are retried with jittered backoff on
+        the next routed model whose breaker is closed.
+        """
+        deadline = time.monotonic() + settings.LLM_DEADLINE_S
+        attempts = max(1, settings.LLM_MAX_ATTEMPTS)
+        last: Optional[ProviderError] = None
+        for attempt in range(attempts):
+            model = self._pick_model(models, attempt)
+            if model is None:
+                telemetry.count_llm(models[0], "breaker_open")
+                raise self._unavailable(models, last) from last
+            timeout = min(settings.LLM_ATTEMPT_TIMEOUT_S, deadline - time.monotonic())
+            hedge_after = (self._latency(model).percentile(settings.LLM_HEDGE_PERCENTILE)
+                           if settings.LLM_HEDGE_ENABLED else None)
+            try:
+                return await hedged(
+                    lambda: self._openrouter_request(messages, model, temperature),
+                    hedge_after, timeout,
+                    on_hedge=lambda: telemetry.count_llm(model, "hedge"),
+                )
+            except asyncio.TimeoutError:
+                self._breaker(model).record_failure()
+                telemetry.count_llm(model, "timeout")
+                last = ProviderError(f"OpenRouter: no answer from {model} within {timeout:.1f}s", retryable=True)
+            except ProviderError as e:
+                if not e.retryable:
+                    raise
+                last = e
+            delay = self._retry_delay(attempt, last)
+            if attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+                break
+            telemetry.count_llm(model, "retry")
+            await asyncio.sleep(delay)
+        raise self._unavailable(models, last) from last
+
+    async def _openrouter_request(self, messages: List[dict], model: str, temperature: float) -> str:
         payload = {
             "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": 256,
         }
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
+        t0 = time.perf_counter()
         try:
-            r.raise_for_status()
-        except Exception as e:
-            # surface provider errors directly; no fallback
-            raise RuntimeError(f"OpenRouter HTTP error: {r.status_code} {r.text[:400]}") from e
+            with telemetry.timed("llm", model=model):
+                r = await self._http().post(OPENROUTER_URL, json=payload)
+        except httpx.TransportError as e:
+            self._breaker(model).record_failure()
+            telemetry.count_llm(model, "transport_error")
+            raise ProviderError(f"OpenRouter transport error: {type(e).__name__}: {e}", retryable=True) from e
+        self._check_status(r.status_code, r.text, r.headers, model)
 
-        data = r.json()
+        self._latency(model).add(time.perf_counter() - t0)
         try:
+            data = r.json()
             text = (data["choices"][0]["message"]["content"] or "").strip()
         except Exception as e:
-            raise RuntimeError(f"OpenRouter response parse error: {data}") from e
+            telemetry.count_llm(model, "parse_error")
+            raise ProviderError(f"OpenRouter response parse error: {r.text[:400]}") from e
 
         if not text:
-            raise RuntimeError("OpenRouter returned empty content.")
+            telemetry.count_llm(model, "empty")
+            raise ProviderError("OpenRouter returned empty content.", retryable=True)
+        telemetry.count_llm(model, "ok", data.get("usage"))
         return text
 
+    def _check_status(self, status: int, body: str, headers: httpx.Headers, model: str) -> None:
+        """Raise ProviderError for HTTP errors; 429/5xx count against the model's breaker and are retryable."""
+        if status == 429 or status >= 500:
+            self._breaker(model).record_failure()
+            telemetry.count_llm(model, f"http_{status}")
+            raise ProviderError(f"OpenRouter HTTP error: {status} {body[:400]}", status=status,
+                                retryable=True, retry_after=_retry_after(headers))
+        # the provider answered: anything past here is about this request, not provider health
+        self._breaker(model).record_success()
+        if status >= 400:
+            telemetry.count_llm(model, f"http_{status}")
+            raise ProviderError(f"OpenRouter HTTP error: {status} {body[:400]}", status=status)
+
+    async def _openrouter_stream(self, messages: List[dict], mode: Optional[str] = None, temperature: float = 0.2) -> AsyncIterator[str]:
+        """Stream deltas; failures before the first delta are retried like `_complete`, later ones are raised."""
+        models = self._models_for(mode)
+        deadline = time.monotonic() + settings.LLM_DEADLINE_S
+        attempts = max(1, settings.LLM_MAX_ATTEMPTS)
+        last: Optional[ProviderError] = None
+        for attempt in range(attempts):
+            model = self._pick_model(models, attempt)
+            if model is None:
+                telemetry.count_llm(models[0], "breaker_open")
+                raise self._unavailable(models, last) from last
+            timeout = min(settings.LLM_ATTEMPT_TIMEOUT_S, deadline - time.monotonic())
+            started = False
+            try:
+                async for delta in self._openrouter_stream_once(messages, model, temperature, timeout, deadline):
+                    started = True
+                    yield delta
+                return
+            except ProviderError as e:
+                if started or not e.retryable:
+                    raise
+                last = e
+            delay = self._retry_delay(attempt, last)
+            if attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+                break
+            telemetry.count_llm(model, "retry")
+            await asyncio.sleep(delay)
+        raise self._unavailable(models, last) from last
+
+    async def _openrouter_stream_once(self, messages: List[dict], model: str, temperature: float,
+                                      timeout: float, deadline: float) -> AsyncIterator[str]:
+        """One streamed attempt; `deadline` (monotonic) bounds the whole stream, not just each read."""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 256,
+            "stream": True,
+        }
+        usage = None
+        # no `timed` block here: a current span would leak into the consumer across `yield`,
+        # and the histogram would include the consumer's time; only time to first token is observed
+        span = telemetry.start_span("llm_stream", model=model)
+        t0: Optional[float] = time.perf_counter()
+        try:
+            # read timeout bounds the wait for the first chunk and every gap after it
+            async with self._http().stream("POST", OPENROUTER_URL, json=payload,
+                                           timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0))) as r:
+                if r.status_code >= 400:
+                    body = (await r.aread()).decode("utf-8", "replace")
+                    self._check_status(r.status_code, body, r.headers, model)
+                self._breaker(model).record_success()
+                lines = r.aiter_lines()
+                while True:
+                    # the read timeout only bounds each gap; a slow steady trickle must still stop at the deadline
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        line = await asyncio.wait_for(lines.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        telemetry.count_llm(model, "timeout")
+                        raise ProviderError(f"OpenRouter: {model} stream did not finish within "
+                                            f"{settings.LLM_DEADLINE_S:.1f}s") from None
+                    # SSE: "data: {...}" chunks, ": comment" keep-alives, "data: [DONE]" terminator
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if "error" in chunk:
+                        telemetry.count_llm(model, "stream_error")
+                        raise ProviderError(f"OpenRouter stream error: {chunk['error']}")
+                    usage = chunk.get("usage") or usage
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        if t0 is not None:
+                            telemetry.observe_stage("llm_stream.first_token", time.perf_counter() - t0)
+                            t0 = None
+                        yield delta
+        except httpx.TransportError as e:
+            self._breaker(model).record_failure()
+            telemetry.count_llm(model, "transport_error")
+            raise ProviderError(f"OpenRouter transport error: {type(e).__name__}: {e}", retryable=True) from e
+        finally:
+            if span is not None:
+                span.end()
+        telemetry.count_llm(model, "ok", usage)
+
     # ---------- Output validation ----------
 
     @staticmethod
@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to `import app.main`
+and to finish the app's lifespan startup (time-to-ready).
+
+Each run is a separate subprocess with `-X importtime`, so nothing is cached
+in-process. Reports median/max over runs, the slowest imports by cumulative
+time, and which heavy packages were already loaded once the app was ready.
+
+    python -m bench.import_bench --runs 5
+    python -m bench.import_bench --with-warmup     # include the classifier warmup (needs the model)
+
+Startup settings come from the environment like the app's (defaults below keep
+the run offline: no sample pool, no cert prefetch, no eager warmup).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+HEAVY = ["transformers", "torch", "firebase_admin", "google.cloud.firestore", "grpc", "optimum"]
+
+PROBE = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import app.main as main
+t1 = time.perf_counter()
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+t2 = asyncio.run(ready())
+print(json.dumps({"import_s": t1 - t0, "ready_s": t2 - t0,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+def parse_importtime(stderr: str, top: int) -> List[Tuple[str, float]]:
+    """`-X importtime` lines: 'import time: self [us] | cumulative | imported package'."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        # one row per root package (wherever it was first pulled in), app.* itself excluded
+        name = name.strip()
+        if "." not in name and name != "app":
+            rows.append((name, int(cumulative) / 1e6))
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+
+def run_once(env: Dict[str, str], top: int) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE % (HEAVY,)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))[-2000:]
+        raise RuntimeError(f"probe failed:\n{tail}")
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    res["slowest"] = parse_importtime(proc.stderr, top)
+    return res
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="slowest root packages to list")
+    ap.add_argument("--with-warmup", action="store_true", help="load + warm the classifier during startup")
+    ap.add_argument("--max-ready-s", type=float, default=None, help="exit 1 if median time-to-ready exceeds this")
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENROUTER_API_KEY", "bench")
+    env.setdefault("SAMPLE_POOL_ENABLED", "false")
+    env.setdefault("AUTH_CERTS_REFRESH_S", "0")
+    env["BIAS_EAGER_WARMUP"] = "true" if args.with_warmup else env.get("BIAS_EAGER_WARMUP", "false")
+
+    runs = [run_once(env, args.top) for _ in range(max(1, args.runs))]
+    imports = [r["import_s"] for r in runs]
+    ready = [r["ready_s"] for r in runs]
+    print(f"import app.main  median={statistics.median(imports):.3f}s  max={max(imports):.3f}s")
+    print(f"time-to-ready    median={statistics.median(ready):.3f}s  max={max(ready):.3f}s  (runs={len(runs)})")
+    print(f"heavy modules loaded at ready: {', '.join(runs[-1]['loaded']) or 'none'}")
+    print("slowest packages (cumulative import time, last run):")
+    for name, secs in runs[-1]["slowest"]:
+        print(f"    {name:<40} {secs:.3f}s")
+
+    if args.max_ready_s is not None and statistics.median(ready) > args.max_ready_s:
+        print(f"REGRESSION median time-to-ready {statistics.median(ready):.3f}s > {args.max_ready_s}s")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
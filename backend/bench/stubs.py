@@ -0,0 +1,269 @@
+"""
+Local stand-ins for the turn pipeline's external dependencies:
+
+  - stub OpenRouter server (real HTTP on localhost, configurable latency + jitter, SSE stream mode)
+  - in-memory Firestore client (same calls FirestoreService makes, with per-round-trip latency)
+  - tiny classifier backend for BiasService (registered as BIAS_BACKEND=bench-stub)
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# ---------- OpenRouter ----------
+
+def openrouter_app(latency_ms: float = 800.0, jitter_ms: float = 200.0, chunks: int = 8):
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    def delay() -> float:
+        return max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000.0
+
+    def reply_for(payload: Dict[str, Any]) -> str:
+        system = (payload.get("messages") or [{}])[0].get("content", "")
+        if "ORIGINAL:" in system:
+            original = system.split("ORIGINAL:", 1)[1].split("INSTRUCTION:", 1)[0].strip()
+            return f"{original.rstrip('.')} for everyone."
+        return f"Only boys are good at building robots #{random.randint(0, 999)}."
+
+    async def chat(request: Request):
+        payload = await request.json()
+        text = reply_for(payload)
+        if not payload.get("stream"):
+            await asyncio.sleep(delay())
+            return JSONResponse({"choices": [{"message": {"role": "assistant", "content": text}}]})
+
+        async def events():
+            total = delay()
+            words = text.split(" ")
+            step = max(1, len(words) // chunks)
+            await asyncio.sleep(total / (chunks + 1))
+            for i in range(0, len(words), step):
+                piece = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n"
+                await asyncio.sleep(total / (chunks + 1))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/api/v1/chat/completions", chat, methods=["POST"])])
+
+class StubServer:
+    """Runs an ASGI app under uvicorn on a background thread."""
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 18080):
+        import uvicorn
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="stub-openrouter", daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub server did not start")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+# ---------- Firestore ----------
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+class _Snapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]], read_time: Optional[datetime] = None):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+        self.read_time = read_time or _now()
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+class _WriteResult:
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+class _Store:
+    def __init__(self, latency_ms: float):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+        self.ops: Dict[str, int] = {"get": 0, "set": 0, "commit": 0, "query": 0}
+        self._latency = latency_ms / 1000.0
+
+    def round_trip(self, op: str) -> None:
+        with self.lock:
+            self.ops[op] += 1
+        if self._latency:
+            time.sleep(self._latency)
+
+    def write(self, path: str, data: Dict[str, Any], merge: bool) -> None:
+        with self.lock:
+            cur = dict(self.docs.get(path) or {}) if merge else {}
+            self.docs[path] = _merge(cur, data)
+
+def _merge(cur: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    from google.cloud.firestore_v1 import Increment
+    for k, v in data.items():
+        if isinstance(v, Increment):
+            cur[k] = (cur.get(k) or 0) + v.value
+        elif isinstance(v, dict):
+            cur[k] = _merge(dict(cur.get(k) or {}), v)
+        else:
+            cur[k] = v
+    return cur
+
+class FakeDocument:
+    def __init__(self, store: _Store, path: str):
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self) -> _Snapshot:
+        self._store.round_trip("get")
+        with self._store.lock:
+            return _Snapshot(self.id, self._store.docs.get(self.path))
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._store.round_trip("set")
+        self._store.write(self.path, data, merge)
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._store, f"{self.path}/{name}")
+
+class _Count:
+    def __init__(self, value: int):
+        self.value = value
+
+class FakeCollection:
+    def __init__(self, store: _Store, path: str, order: Optional[tuple] = None, limit_n: Optional[int] = None,
+                 where: Optional[tuple] = None):
+        self._store = store
+        self._path = path
+        self._order = order
+        self._limit = limit_n
+        self._where = where
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self._store, f"{self._path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+    def select(self, fields: List[str]) -> "FakeCollection":
+        return self
+
+    def order_by(self, field: str, direction: Any = "ASCENDING") -> "FakeCollection":
+        return FakeCollection(self._store, self._path, (field, "DESC" in str(direction).upper()), self._limit,
+                              self._where)
+
+    def limit(self, n: int) -> "FakeCollection":
+        return FakeCollection(self._store, self._path, self._order, n, self._where)
+
+    def where(self, filter: Any) -> "FakeCollection":
+        # only the numeric ">" filter the leaderboard uses
+        return FakeCollection(self._store, self._path, self._order, self._limit,
+                              (filter.field_path, filter.value))
+
+    def count(self) -> "FakeCollection":
+        return self
+
+    def get(self) -> List[List[_Count]]:
+        self._store.round_trip("query")
+        return [[_Count(len(self._docs()))]]
+
+    def _docs(self) -> List[tuple]:
+        prefix = self._path + "/"
+        with self._store.lock:
+            docs = [(p[len(prefix):], dict(d)) for p, d in self._store.docs.items()
+                    if p.startswith(prefix) and "/" not in p[len(prefix):]]
+        if self._where:
+            field, value = self._where
+            docs = [x for x in docs if (x[1].get(field) or 0) > value]
+        return docs
+
+    def stream(self):
+        self._store.round_trip("query")
+        with self._store.lock:  # reentrant: read time and contents form one snapshot
+            read_time = _now()
+            docs = self._docs()
+        if self._order:
+            field, desc = self._order
+            docs.sort(key=lambda x: x[1].get(field) or 0, reverse=desc)
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return iter([_Snapshot(i, d, read_time) for i, d in docs])
+
+class FakeBatch:
+    def __init__(self, store: _Store):
+        self._store = store
+        self._writes: List[tuple] = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((ref.path, data, merge))
+
+    def create(self, ref: FakeDocument, data: Dict[str, Any]) -> None:
+        self._writes.append((ref.path, data, None))  # None = must not exist yet
+
+    def commit(self) -> List[_WriteResult]:
+        from google.api_core.exceptions import AlreadyExists
+        self._store.round_trip("commit")
+        with self._store.lock:
+            # all-or-nothing, like Firestore: a failed precondition applies no writes
+            for path, _, merge in self._writes:
+                if merge is None and path in self._store.docs:
+                    raise AlreadyExists(f"Document already exists: {path}")
+            for path, data, merge in self._writes:
+                self._store.docs[path] = _merge(dict(self._store.docs.get(path) or {}) if merge else {}, data)
+            committed = _now()
+        return [_WriteResult(committed) for _ in self._writes]
+
+class FakeFirestore:
+    """In-memory stand-in for google.cloud.firestore.Client, covering what the app uses."""
+    def __init__(self, latency_ms: float = 15.0):
+        self.store = _Store(latency_ms)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self.store, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self.store)
+
+# ---------- classifier ----------
+
+class StubClassifier:
+    """
+    Pipeline-shaped callable: cost = base_ms per forward pass + per_item_ms per text,
+    score = deterministic function of the text.
+    """
+    def __init__(self, base_ms: float = 20.0, per_item_ms: float = 4.0):
+        self._base = base_ms / 1000.0
+        self._per_item = per_item_ms / 1000.0
+        self.calls = 0
+        self.items = 0
+
+    def __call__(self, texts, batch_size: int = 1, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self.calls += 1
+        self.items += len(texts)
+        time.sleep(self._base + self._per_item * len(texts))
+        out = []
+        for t in texts:
+            p = (sum(map(ord, t)) % 1000) / 1000.0
+            if "everyone" in t.lower():
+                p = p * 0.1
+            out.append([{"label": "toxic", "score": p}, {"label": "neutral", "score": 1 - p}])
+        return out
+
+def register_stub_classifier(base_ms: float = 20.0, per_item_ms: float = 4.0) -> StubClassifier:
+    from app.services import inference
+    clf = StubClassifier(base_ms, per_item_ms)
+    inference.BACKENDS["bench-stub"] = lambda model_name: clf
+    return clf
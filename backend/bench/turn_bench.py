@@ -0,0 +1,229 @@
+"""
+Offline load test for POST /api/turn.
+
+Drives the real FastAPI `app` in-process against local stand-ins (see bench/stubs.py):
+a stub OpenRouter server, an in-memory Firestore and a stub classifier (or any small
+HF model via --classifier). Reports p50/p95/p99 latency, requests/s and per-stage
+breakdowns (from the Server-Timing header) per concurrency level.
+
+    python -m bench.turn_bench --concurrency 1,8,32 --requests 200
+    python -m bench.turn_bench --save-baseline bench/baselines/turn.json
+    python -m bench.turn_bench --baseline bench/baselines/turn.json   # exit 1 on regression
+
+bench/baselines/turn.json is the committed reference run (stub classifier, default
+latencies, --concurrency 1,8,32 --requests 60). Compare with the same flags, and
+re-record it with --save-baseline on new hardware or after an intended change.
+
+Any app setting can still be overridden through the environment (e.g. BIAS_MICROBATCH=false).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from bench.stubs import FakeFirestore, StubServer, openrouter_app, register_stub_classifier
+
+ORIGINALS = [
+    "Girls are too emotional to be good leaders.",
+    "Old people can't understand video games.",
+    "Boys are naturally better at science than girls.",
+    "Grandparents are too slow to learn coding.",
+    "Only men should be firefighters.",
+    "Teenagers are always lazy and never help out.",
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return round(ordered[k], 2)
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";dur=")
+        if name and rest:
+            try:
+                out[name] = float(rest)
+            except ValueError:
+                pass
+    return out
+
+def build_app(args):
+    """Point settings at the stand-ins, then import the app."""
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{args.port}/api/v1"
+    os.environ.setdefault("SAMPLE_POOL_ENABLED", "false")
+    os.environ.setdefault("AUTH_CERTS_REFRESH_S", "0")
+    os.environ.setdefault("RATE_TURN_PER_MIN", "0")  # measure the turn path, not the per-user limiter
+    os.environ.setdefault("BIAS_CACHE_PATH", "")
+    if args.classifier == "stub":
+        os.environ["BIAS_BACKEND"] = "bench-stub"
+    else:
+        os.environ["BIAS_MODEL_NAME"] = args.classifier
+
+    fake_db = FakeFirestore(latency_ms=args.firestore_ms)
+    import app.core.firebase as firebase
+    firebase.get_db = lambda: fake_db
+    clf = register_stub_classifier(args.classifier_base_ms, args.classifier_item_ms)
+
+    from fastapi import Request
+    from app.deps.auth import get_current_user
+    from app.main import app
+
+    def bench_user(request: Request):
+        uid = request.headers.get("x-bench-uid", "bench-0")
+        return {"uid": uid, "name": uid, "picture": None}
+
+    app.dependency_overrides[get_current_user] = bench_user
+    return app, fake_db, clf
+
+async def run_level(client, concurrency: int, n_requests: int, n_users: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= n_requests:
+                return
+            body = {
+                "mode": "gpt4-gender",
+                "original": ORIGINALS[i % len(ORIGINALS)],
+                "instruction": "Make it fair for everyone.",
+                "messages": [],
+            }
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/api/turn", json=body, headers={"x-bench-uid": f"bench-{i % n_users}"})
+            except Exception:
+                errors += 1
+                continue
+            dt = (time.perf_counter() - t0) * 1000.0
+            if r.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(dt)
+            for name, ms in parse_server_timing(r.headers.get("server-timing", "")).items():
+                stages[name].append(ms)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t_start
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "stages": {name: {"p50_ms": percentile(v, 50), "p95_ms": percentile(v, 95)}
+                   for name, v in sorted(stages.items())},
+    }
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    app, fake_db, clf = build_app(args)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await run_level(client, 1, args.warmup, args.users)
+            for c in levels:
+                ops_before = dict(fake_db.store.ops)
+                calls_before = (clf.calls, clf.items)
+                res = await run_level(client, c, args.requests, args.users)
+                res["firestore_ops_per_turn"] = {
+                    k: round((fake_db.store.ops[k] - ops_before[k]) / max(1, args.requests), 2)
+                    for k in fake_db.store.ops
+                }
+                res["classifier_batches"] = clf.calls - calls_before[0]
+                res["classifier_items"] = clf.items - calls_before[1]
+                results.append(res)
+                print_level(res)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "llm_latency_ms": args.llm_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "firestore_ms": args.firestore_ms,
+            "classifier": args.classifier,
+            "env": {k: v for k, v in os.environ.items() if k.startswith(("BIAS_", "FIRESTORE_", "OPENROUTER_T", "OPENROUTER_MAX", "RATE_", "ADMISSION_", "EXPLAIN_"))},
+        },
+        "levels": results,
+    }
+
+def print_level(res: Dict[str, Any]) -> None:
+    print(f"c={res['concurrency']:<4} rps={res['rps']:<8} p50={res['p50_ms']:<9} p95={res['p95_ms']:<9} "
+          f"p99={res['p99_ms']:<9} errors={res['errors']} batches={res['classifier_batches']}")
+    for name, s in res["stages"].items():
+        print(f"    {name:<16} p50={s['p50_ms']:<9} p95={s['p95_ms']}")
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: p95 up or rps down by more than `tolerance` at any shared concurrency level."""
+    base = {lvl["concurrency"]: lvl for lvl in baseline.get("levels", [])}
+    problems = []
+    for lvl in current["levels"]:
+        ref = base.get(lvl["concurrency"])
+        if ref is None:
+            continue
+        if ref["p95_ms"] and lvl["p95_ms"] > ref["p95_ms"] * (1 + tolerance):
+            problems.append(f"c={lvl['concurrency']}: p95 {ref['p95_ms']} -> {lvl['p95_ms']} ms")
+        if ref["rps"] and lvl["rps"] < ref["rps"] * (1 - tolerance):
+            problems.append(f"c={lvl['concurrency']}: rps {ref['rps']} -> {lvl['rps']}")
+    return problems
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--concurrency", default="1,8,32,64", help="comma-separated concurrency levels")
+    ap.add_argument("--requests", type=int, default=200, help="requests per level")
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--users", type=int, default=50, help="distinct uids to spread turns over")
+    ap.add_argument("--llm-ms", type=float, default=800.0, help="stub OpenRouter mean latency")
+    ap.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    ap.add_argument("--firestore-ms", type=float, default=15.0, help="latency per fake Firestore round-trip")
+    ap.add_argument("--classifier", default="stub", help="'stub' or a HF model name, e.g. a tiny test model")
+    ap.add_argument("--classifier-base-ms", type=float, default=20.0)
+    ap.add_argument("--classifier-item-ms", type=float, default=4.0)
+    ap.add_argument("--port", type=int, default=18080, help="port for the stub OpenRouter server")
+    ap.add_argument("--out", default=None, help="write results JSON here (default bench/results/)")
+    ap.add_argument("--save-baseline", default=None, help="also write results to this baseline path")
+    ap.add_argument("--baseline", default=None, help="compare against this baseline and exit 1 on regression")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args()
+
+    with StubServer(openrouter_app(args.llm_ms, args.llm_jitter_ms), port=args.port):
+        report = asyncio.run(run(args))
+
+    out = args.out or os.path.join(os.path.dirname(__file__), "results", f"turn-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    for path in filter(None, [out, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
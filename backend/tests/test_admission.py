@@ -0,0 +1,149 @@
+"""
+Admission control: LocalRateStore token buckets and the FIFO ConcurrencyGate.
+
+The gate tests drive it from one event loop with asyncio.run, so no async
+pytest plugin is needed.
+"""
+import asyncio
+import math
+
+import pytest
+from fastapi import HTTPException
+
+from app.deps.admission import ConcurrencyGate, LocalRateStore
+
+# ---------- LocalRateStore ----------
+
+def test_bucket_admits_burst_then_reports_wait():
+    store = LocalRateStore()
+    assert [store.take("u", rate_per_s=1.0, burst=3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = store.take("u", rate_per_s=1.0, burst=3)
+    assert 0.9 < wait <= 1.0
+    assert store.take("other", rate_per_s=1.0, burst=3) == 0.0  # buckets are per key
+    assert store.stats()["rejected"] == 1
+
+def test_bucket_without_refill_waits_forever():
+    store = LocalRateStore()
+    assert store.take("u", rate_per_s=0.0, burst=1) == 0.0
+    assert math.isinf(store.take("u", rate_per_s=0.0, burst=1))
+
+def test_bucket_store_is_lru_bounded():
+    store = LocalRateStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.take(key, rate_per_s=1.0, burst=1)
+    assert store.stats()["keys"] == 2
+    assert store.take("a", rate_per_s=1.0, burst=1) == 0.0  # evicted, so it starts from a full bucket
+
+# ---------- ConcurrencyGate ----------
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_gate_admits_waiters_in_arrival_order():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=8, queue_timeout_s=5)
+        await gate.acquire()
+        order = []
+
+        async def waiter(i):
+            await gate.acquire()
+            order.append(i)
+            await asyncio.sleep(0)
+            gate.release()
+
+        tasks = []
+        for i in range(4):
+            tasks.append(asyncio.ensure_future(waiter(i)))
+            await _settle()
+        assert gate.waiting == 4
+        gate.release()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3]
+        assert gate.stats()["active"] == 0
+
+    asyncio.run(main())
+
+def test_gate_new_arrival_queues_behind_waiters():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=8, queue_timeout_s=5)
+        await gate.acquire()
+        first = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        gate.release()  # the slot goes to `first`, not to whoever calls acquire next
+        late = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        assert first.done() and not late.done()
+        gate.release()
+        await late
+        gate.release()
+
+    asyncio.run(main())
+
+def test_gate_rejects_when_queue_is_full():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=1, queue_timeout_s=5)
+        await gate.acquire()
+        queued = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        with pytest.raises(HTTPException) as exc:
+            await gate.acquire()
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "1"
+        assert gate.stats()["rejected"] == 1
+        gate.release()
+        await queued
+        gate.release()
+
+    asyncio.run(main())
+
+def test_gate_timeout_rejects_and_frees_the_queue_slot():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=1, queue_timeout_s=0.05)
+        await gate.acquire()
+        with pytest.raises(HTTPException) as exc:
+            await gate.acquire()
+        assert exc.value.status_code == 429
+        assert gate.waiting == 0
+        gate.release()
+        await asyncio.wait_for(gate.acquire(), 1)  # the running slot was not leaked either
+        assert gate.stats()["active"] == 1
+
+    asyncio.run(main())
+
+def test_gate_cancelled_waiter_leaves_the_queue():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=4, queue_timeout_s=5)
+        await gate.acquire()
+        cancelled = asyncio.ensure_future(gate.acquire())
+        nxt = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        cancelled.cancel()
+        await _settle()
+        assert gate.waiting == 1
+        gate.release()
+        await asyncio.wait_for(nxt, 1)
+        gate.release()
+        assert gate.stats()["active"] == 0
+
+    asyncio.run(main())
+
+def test_gate_slot_handed_to_a_waiter_that_gives_up_is_not_lost():
+    async def main():
+        gate = ConcurrencyGate(limit=1, queue=4, queue_timeout_s=5)
+        await gate.acquire()
+        quitter = asyncio.ensure_future(gate.acquire())
+        nxt = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        gate.release()  # resolves the quitter's future...
+        quitter.cancel()  # ...and cancels it before it runs
+        await _settle()
+        # depending on the Python version wait_for either keeps the slot or passes it on
+        if not quitter.cancelled():
+            gate.release()
+        await asyncio.wait_for(nxt, 1)
+        gate.release()
+        assert gate.stats()["active"] == 0
+        await asyncio.wait_for(gate.acquire(), 1)
+
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+MicroBatcher: concurrent submissions coalesce into one call of `fn`, results
+map back to their callers in order, and a misbehaving `fn` fails its callers
+instead of leaving them waiting.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+class Recorder:
+    """`fn` stand-in: records each batch, optionally blocking until released."""
+    def __init__(self, result=lambda items: [f"r:{i}" for i in items]):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._result = result
+
+    def __call__(self, items):
+        self.gate.wait(5)
+        self.batches.append(list(items))
+        return self._result(items)
+
+def test_concurrent_callers_share_one_call():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch_size=16, max_wait_ms=200)
+    results = {}
+
+    def caller(i):
+        results[i] = batcher.run([f"t{i}"])
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == {i: [f"r:t{i}"] for i in range(6)}
+    assert len(fn.batches) == 1 and sorted(fn.batches[0]) == sorted(f"t{i}" for i in range(6))
+
+def test_batch_size_caps_each_call():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=50)
+    assert batcher.run(list(range(10))) == [f"r:{i}" for i in range(10)]
+    assert [len(b) for b in fn.batches] == [4, 4, 2]
+
+def test_window_closed_still_takes_queued_items():
+    fn = Recorder()
+    fn.gate.clear()
+    batcher = MicroBatcher(fn, max_batch_size=8, max_wait_ms=0)
+    first = batcher.submit(["a"])
+    time.sleep(0.05)  # the worker is now blocked inside fn with ["a"]
+    rest = batcher.submit(["b", "c", "d"])
+    fn.gate.set()
+    assert [f.result(5) for f in first + rest] == ["r:a", "r:b", "r:c", "r:d"]
+    assert fn.batches == [["a"], ["b", "c", "d"]]
+
+def test_wrong_number_of_results_fails_every_caller():
+    fn = Recorder(result=lambda items: [0] * (len(items) - 1))
+    batcher = MicroBatcher(fn, max_batch_size=8, max_wait_ms=20, name="short")
+    futures = batcher.submit(["a", "b", "c"])
+    for f in futures:
+        with pytest.raises(RuntimeError, match="short: fn returned 2 results for 3 items"):
+            f.result(5)
+
+def test_exception_fails_the_batch_and_worker_keeps_running():
+    calls = []
+
+    def fn(items):
+        calls.append(list(items))
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return items
+
+    batcher = MicroBatcher(fn, max_batch_size=8, max_wait_ms=20)
+    with pytest.raises(ValueError, match="boom"):
+        batcher.run(["a", "b"])
+    assert batcher.run(["c"]) == ["c"]
+
+def test_live_items_run_before_queued_background_items():
+    fn = Recorder()
+    fn.gate.clear()
+    batcher = MicroBatcher(fn, max_batch_size=2, max_wait_ms=0)
+    batcher.submit(["bg0"], priority=1)
+    time.sleep(0.05)  # worker blocked on the first background batch
+    background = batcher.submit(["bg1", "bg2", "bg3"], priority=1)
+    live = batcher.submit(["live"])
+    fn.gate.set()
+    assert live[0].result(5) == "r:live"
+    for f in background:
+        f.result(5)
+    # background never shares a batch with live items, and the live one jumps the queue
+    assert fn.batches == [["bg0"], ["live"], ["bg1", "bg2"], ["bg3"]]
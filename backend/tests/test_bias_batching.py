@@ -0,0 +1,67 @@
+"""
+Length-bucketed scoring must match the plain pipeline: BiasService._score_batch
+tokenizes once and runs one padded forward pass per bucket, which has to give
+the same probabilities as scoring every text through TextClassificationPipeline.
+
+Uses BIAS_MODEL_NAME (or BIAS_PARITY_MODEL to point at a small local model);
+skips when torch/transformers or the model weights are not available.
+"""
+import importlib.util
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.bias import BiasService
+from app.services.inference import _pytorch
+
+MODEL = os.getenv("BIAS_PARITY_MODEL") or settings.BIAS_MODEL_NAME
+TOLERANCE = 1e-3
+
+# short to long, so the batch spans several power-of-two buckets; the last one is past BIAS_MAX_TOKENS
+TEXTS = [
+    "Girls can't code.",
+    "Everyone can be good at math with practice.",
+    "Old people can't learn how to use computers, so there is no point in showing them.",
+    " ".join(["Boys shouldn't cry or show their feelings because that is what girls do."] * 4),
+    " ".join(["People of any age can learn new technology if someone is patient with them."] * 12),
+    " ".join(["Teenagers are always lazy and never help out at home."] * 60),
+]
+
+def _require(module: str) -> None:
+    if importlib.util.find_spec(module) is None:
+        pytest.skip(f"{module} is not installed")
+
+@pytest.fixture(scope="module")
+def reference():
+    _require("torch")
+    _require("transformers")
+    try:
+        return _pytorch(MODEL)
+    except OSError as e:  # weights not cached and no network
+        pytest.skip(f"cannot load {MODEL}: {e}")
+
+@pytest.fixture
+def service(reference, monkeypatch):
+    monkeypatch.setattr(settings, "BIAS_BACKEND", "pytorch")
+    monkeypatch.setattr(settings, "BIAS_MICROBATCH", False)
+    monkeypatch.setattr(settings, "BIAS_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "BIAS_CACHE_PATH", "")
+    monkeypatch.setattr(settings, "BIAS_BATCH_MAX_SIZE", 2)  # also split buckets at the batch size
+    svc = BiasService(MODEL)
+    svc._pipe = reference
+    return svc
+
+def test_texts_span_buckets_and_truncation(reference):
+    lengths = [len(ids) for ids in reference.tokenizer(TEXTS)["input_ids"]]
+    assert len({max(8, 1 << (n - 1).bit_length()) for n in lengths}) >= 3
+    assert max(lengths) > settings.BIAS_MAX_TOKENS
+
+@pytest.mark.parametrize("order", ["short_first", "long_first"])
+def test_bucketed_scores_match_pipeline(reference, service, order):
+    texts = TEXTS if order == "short_first" else TEXTS[::-1]
+    expected = [BiasService._pick(o) for o in reference(texts, truncation=True, max_length=settings.BIAS_MAX_TOKENS)]
+    got = service._score_batch(texts)
+    assert len(got) == len(texts)
+    for e, g in zip(expected, got):
+        assert abs(e - g) <= TOLERANCE
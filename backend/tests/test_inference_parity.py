@@ -0,0 +1,36 @@
+"""
+Backend parity: quantized/ONNX scores must stay within tolerance of the PyTorch reference.
+
+Uses BIAS_MODEL_NAME (or BIAS_PARITY_MODEL to point at a small local model);
+skips when the backend's runtime or the model weights are not available.
+"""
+import importlib.util
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.inference import PARITY_TEXTS, _pytorch, check_parity
+
+MODEL = os.getenv("BIAS_PARITY_MODEL") or settings.BIAS_MODEL_NAME
+TOLERANCE = float(os.getenv("BIAS_PARITY_TOLERANCE", "0.02"))
+
+def _require(module: str) -> None:
+    if importlib.util.find_spec(module) is None:
+        pytest.skip(f"{module} is not installed")
+
+@pytest.fixture(scope="module")
+def reference_available():
+    _require("torch")
+    _require("transformers")
+    try:
+        _pytorch(MODEL)
+    except OSError as e:  # weights not cached and no network
+        pytest.skip(f"cannot load {MODEL}: {e}")
+
+@pytest.mark.parametrize("backend,runtime", [("quantized", "torch"), ("onnx", "optimum.onnxruntime")])
+def test_backend_matches_pytorch(reference_available, backend, runtime):
+    _require(runtime.split(".")[0])
+    _require(runtime)
+    result = check_parity(backend, MODEL, PARITY_TEXTS, tolerance=TOLERANCE)
+    assert result["max_abs_diff"] <= TOLERANCE
@@ -0,0 +1,89 @@
+"""
+Request coalescing: followers share the leader's result and its error, and a
+finished key (success or failure) is forgotten so the next caller starts fresh.
+"""
+import asyncio
+
+import pytest
+
+from app.services.singleflight import AsyncSingleFlight, SingleFlight
+
+# ---------- SingleFlight (threads) ----------
+
+def test_claim_splits_owned_and_waiting_keys():
+    flight = SingleFlight()
+    owned, waiting = flight.claim(["a", "b"])
+    assert owned == ["a", "b"] and waiting == {}
+    owned2, waiting2 = flight.claim(["b", "c"])
+    assert owned2 == ["c"] and list(waiting2) == ["b"]
+    flight.resolve({"a": 1, "b": 2, "c": 3})
+    assert waiting2["b"].result(1) == 2
+    assert flight.stats() == {"leaders": 3, "followers": 1, "inflight": 0}
+
+def test_leader_failure_reaches_followers_and_frees_the_key():
+    flight = SingleFlight()
+    owned, _ = flight.claim(["k"])
+    _, waiting = flight.claim(["k"])
+    flight.fail(owned, ValueError("model crashed"))
+    with pytest.raises(ValueError, match="model crashed"):
+        waiting["k"].result(1)
+    assert flight.stats()["inflight"] == 0
+    again, _ = flight.claim(["k"])  # not stuck on the failed attempt
+    assert again == ["k"]
+
+# ---------- AsyncSingleFlight (event loop) ----------
+
+def test_async_callers_share_one_call():
+    async def main():
+        flight = AsyncSingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        assert results == ["done"] * 5 and calls == 1
+        assert flight.stats() == {"leaders": 1, "followers": 4, "inflight": 0}
+
+    asyncio.run(main())
+
+def test_async_error_propagates_to_every_caller_then_clears():
+    async def main():
+        flight = AsyncSingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream 503")
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(3)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(r, RuntimeError) and str(r) == "upstream 503" for r in results)
+        assert flight.stats()["inflight"] == 0
+        with pytest.raises(RuntimeError):
+            await flight.do("k", fn)
+        assert calls == 2  # a new call, not the cached failure
+
+    asyncio.run(main())
+
+def test_async_cancelled_caller_does_not_cancel_the_others():
+    async def main():
+        flight = AsyncSingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("k", fn))
+        follower = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "done"
+        assert leader.cancelled()
+
+    asyncio.run(main())